@@ -9,6 +9,8 @@ load_dotenv()
 
 # Get the bot token from environment variables
 TOKEN = os.getenv('DISCORD_TOKEN')
+# Register the slash commands with Discord on startup; only needed after they change
+SYNC_COMMANDS = os.getenv('SYNC_COMMANDS', '').lower() in ('1', 'true', 'yes', 'on')
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,14 +20,55 @@ logger = logging.getLogger(__name__)
 intents = discord.Intents.default()
 intents.message_content = True
 
-# Define the bot's command prefix (e.g., '!')
-bot = commands.Bot(command_prefix='!', intents=intents)
-
 # Import the setup function from cogs
 from cogs import setup_cogs
+from cogs.tmdb import TMDBClient
+from cogs.store import WatchlistStore
+from cogs.metrics import metrics, instrument_discord_http, LoopLagMonitor, start_metrics_server, METRICS_PORT
+from cogs.stalls import StallDetector, DIAGNOSTICS
+
+class Projectionist(commands.AutoShardedBot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Shared TMDB connection pool, opened and closed with the bot
+        self.tmdb = TMDBClient()
+        # Local SQLite snapshot of the watchlist for warm starts
+        self.store = WatchlistStore()
+        self.loop_lag = LoopLagMonitor()
+        self.metrics_server = None
+        # Opt-in event loop stall profiler, toggled with !diagnostics
+        self.stalls = StallDetector()
+        # State cogs hand over to their next instance across !reload
+        self.cog_state = {}
+
+    async def setup_hook(self):
+        await self.tmdb.start()
+        # Runtime metrics: Discord REST calls, TMDB client state, loop lag
+        instrument_discord_http(self.http)
+        metrics.add_collector('tmdb', self.tmdb.collect_metrics)
+        self.loop_lag.start()
+        if METRICS_PORT:
+            self.metrics_server = await start_metrics_server()
+        # Load cogs inside the bot's own event loop
+        await setup_cogs(self)
+        if SYNC_COMMANDS:
+            synced = await self.tree.sync()
+            logger.info(f"Synced {len(synced)} slash commands.")
+        if DIAGNOSTICS:
+            self.stalls.index_bot(self)
+            self.stalls.enable()
+
+    async def close(self):
+        await super().close()
+        self.stalls.disable()
+        self.loop_lag.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.cleanup()
+        await self.tmdb.close()
+        self.store.close()
 
-# Load cogs
-setup_cogs(bot)
+# Define the bot's command prefix (e.g., '!'); shards are picked automatically
+bot = Projectionist(command_prefix='!', intents=intents)
 
 # Event: When the bot is ready
 @bot.event
@@ -33,4 +76,5 @@ async def on_ready():
     logger.info(f'Logged in as {bot.user}')
 
 # Run the bot with your token
-bot.run(TOKEN)
+if __name__ == '__main__':
+    bot.run(TOKEN)
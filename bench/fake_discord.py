@@ -0,0 +1,69 @@
+from collections import Counter
+from types import SimpleNamespace
+
+# Discord API calls made through the fakes, by kind
+calls = Counter()
+
+class FakeMessage:
+    def __init__(self, content=None, embed=None, view=None):
+        self.content = content
+        self.embed = embed
+        self.view = view
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        calls['edit'] += 1
+        self.content = content if content is not None else self.content
+        self.embed = embed if embed is not None else self.embed
+
+    async def add_reaction(self, emoji):
+        calls['add_reaction'] += 1
+
+    async def clear_reactions(self):
+        calls['clear_reactions'] += 1
+
+class FakeChannel:
+    def __init__(self, channel_id=1):
+        self.id = channel_id
+        self.messages = []
+
+    async def send(self, content=None, embed=None, view=None, **kwargs):
+        calls['send'] += 1
+        message = FakeMessage(content, embed, view)
+        self.messages.append(message)
+        return message
+
+class FakeUser:
+    def __init__(self, user_id=1, manage_guild=True):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.guild_permissions = SimpleNamespace(manage_guild=manage_guild)
+        self.dm_channel = FakeChannel()
+
+    async def create_dm(self):
+        calls['create_dm'] += 1
+        return self.dm_channel
+
+    async def send(self, *args, **kwargs):
+        return await self.dm_channel.send(*args, **kwargs)
+
+class FakeContext:
+    def __init__(self, guild_id=1, user=None):
+        self.guild = SimpleNamespace(id=guild_id) if guild_id is not None else None
+        self.author = user or FakeUser()
+        self.message = SimpleNamespace(author=self.author)
+        self.channel = FakeChannel()
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+class FakeInteractionResponse:
+    async def send_message(self, *args, **kwargs):
+        calls['interaction_response'] += 1
+
+    async def edit_message(self, *args, **kwargs):
+        calls['interaction_response'] += 1
+
+class FakeInteraction:
+    def __init__(self, user):
+        self.user = user
+        self.response = FakeInteractionResponse()
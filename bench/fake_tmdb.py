@@ -0,0 +1,138 @@
+import random
+import asyncio
+from collections import Counter
+from aiohttp import web
+
+PAGE_SIZE = 20
+
+def make_movie(movie_id):
+    return {
+        'id': movie_id,
+        'title': f"Movie {movie_id}",
+        'original_title': f"Movie {movie_id}",
+        'overview': f"Overview for movie {movie_id}. " * 8,
+        'release_date': f"{1950 + movie_id % 75}-01-01",
+        'vote_average': round(4 + (movie_id % 60) / 10, 1),
+        'vote_count': movie_id * 7,
+        'poster_path': f"/poster{movie_id}.jpg",
+        'backdrop_path': f"/backdrop{movie_id}.jpg",
+        'genre_ids': [27, 18],
+        'popularity': 12.5,
+        'adult': False,
+        'video': False,
+        'original_language': 'en',
+        'media_type': 'movie'
+    }
+
+class FakeTMDB:
+    # Stand-in for the TMDB v3 endpoints the cogs use, with tunable latency,
+    # error rate and list size
+    def __init__(self, list_id='1', list_size=200, latency=0.05, jitter=0.01, error_rate=0.0, seed=None):
+        self.list_id = str(list_id)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.items = [make_movie(movie_id) for movie_id in range(1, list_size + 1)]
+        self.requests = Counter()
+        self.runner = None
+        self.url = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/list/{list_id}', self.get_list)
+        app.router.add_post('/list/{list_id}/add_item', self.add_item)
+        app.router.add_post('/list/{list_id}/remove_item', self.remove_item)
+        app.router.add_get('/search/movie', self.search_movie)
+        app.router.add_get('/movie/{movie_id}', self.movie_details)
+        app.router.add_get('/authentication/token/new', self.request_token)
+        app.router.add_post('/authentication/session/new', self.new_session)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def _respond(self, endpoint):
+        self.requests[endpoint] += 1
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        if self.error_rate and self.random.random() < self.error_rate:
+            if self.random.random() < 0.5:
+                return web.json_response({'status_code': 25, 'status_message': 'Rate limited.'}, status=429, headers={'Retry-After': '0.1'})
+            return web.json_response({'status_code': 11, 'status_message': 'Internal error.'}, status=500)
+        return None
+
+    async def get_list(self, request):
+        error = await self._respond('list')
+        if error is not None:
+            return error
+        if request.match_info['list_id'] != self.list_id:
+            return web.json_response({'status_code': 34, 'status_message': 'Not found.'}, status=404)
+        page = int(request.query.get('page', 1))
+        total_pages = max(1, -(-len(self.items) // PAGE_SIZE))
+        return web.json_response({
+            'id': self.list_id,
+            'name': 'Benchmark List',
+            'item_count': len(self.items),
+            'total_results': len(self.items),
+            'total_pages': total_pages,
+            'page': page,
+            'items': self.items[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        })
+
+    async def add_item(self, request):
+        error = await self._respond('add_item')
+        if error is not None:
+            return error
+        media_id = int((await request.json())['media_id'])
+        if any(movie['id'] == media_id for movie in self.items):
+            return web.json_response({'status_code': 8, 'status_message': 'Duplicate entry.'}, status=403)
+        self.items.append(make_movie(media_id))
+        return web.json_response({'status_code': 12, 'status_message': 'Created.'}, status=201)
+
+    async def remove_item(self, request):
+        error = await self._respond('remove_item')
+        if error is not None:
+            return error
+        media_id = int((await request.json())['media_id'])
+        self.items = [movie for movie in self.items if movie['id'] != media_id]
+        return web.json_response({'status_code': 13, 'status_message': 'Deleted.'})
+
+    async def search_movie(self, request):
+        error = await self._respond('search')
+        if error is not None:
+            return error
+        query = request.query.get('query', '')
+        # Stable fake id per query, outside the range used by the list
+        movie = make_movie(100000 + sum(map(ord, query)) * 31 % 100000)
+        movie['title'] = query.title()
+        return web.json_response({'page': 1, 'results': [movie], 'total_pages': 1, 'total_results': 1})
+
+    async def movie_details(self, request):
+        error = await self._respond('details')
+        if error is not None:
+            return error
+        movie = make_movie(int(request.match_info['movie_id']))
+        movie.update(runtime=90 + movie['id'] % 60, genres=[{'id': 27, 'name': 'Horror'}, {'id': 18, 'name': 'Drama'}])
+        return web.json_response(movie)
+
+    async def request_token(self, request):
+        error = await self._respond('request_token')
+        if error is not None:
+            return error
+        return web.json_response({'success': True, 'request_token': 'bench-token'})
+
+    async def new_session(self, request):
+        error = await self._respond('new_session')
+        if error is not None:
+            return error
+        return web.json_response({'success': True, 'session_id': 'bench-session'})
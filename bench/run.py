@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+from .fake_tmdb import FakeTMDB
+from . import fake_discord
+from .fake_discord import FakeContext, FakeInteraction
+
+# Runs the cogs offline against a local TMDB stand-in and fake Discord
+# objects, and reports latency, TMDB request counts and event-loop stalls
+# per scenario.
+#
+#   python -m bench.run --list-size 1000 --latency 0.05 --iterations 50
+
+class LoopMonitor:
+    # Samples event-loop lag: how late a short sleep wakes up
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def reset(self):
+        self.lags = []
+
+    def summary(self):
+        if not self.lags:
+            return 0.0, 0.0
+        # Lag beyond a couple of sample intervals means something blocked the loop
+        blocked = sum(lag for lag in self.lags if lag > 2 * self.interval)
+        return max(self.lags), blocked
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+async def build_bot(tmdb_url, workdir):
+    # Point the cogs at the stand-in before they are imported
+    os.environ['TMDB_URL'] = tmdb_url
+    os.environ['TMDB_LIST_ID'] = '1'
+    # The bench guild uses the default session, like the operator's own server
+    os.environ['HOME_GUILD_IDS'] = '1'
+    os.environ['WATCHLIST_DB'] = os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+    with open('tmdb_session.json', 'w') as f:
+        json.dump({'session_id': 'bench-session'}, f)
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+    bot = app.Projectionist(command_prefix='!', intents=app.intents)
+
+    async def confirm(*args, **kwargs):
+        return SimpleNamespace(emoji='✅'), None
+    bot.wait_for = confirm
+
+    await bot._async_setup_hook()
+    await bot.setup_hook()
+
+    # The wheel animation is pure sleep; leave it out of the numbers. Patch
+    # the module load_extension just executed, not an earlier import.
+    sys.modules['cogs.movie_commands'].SPIN_DURATION = 0
+    return bot
+
+async def check_timeouts(timeout=0.2, latency=1.0):
+    # A TMDB call must give up after the client's timeout, not wait for a
+    # slow server to answer
+    from cogs.tmdb import TMDBClient
+    server = FakeTMDB(list_size=20, latency=latency, jitter=0.0)
+    url = await server.start()
+    client = TMDBClient(token='bench', base_url=url, timeout=timeout)
+    try:
+        started = time.perf_counter()
+        response = await client._send('GET', '/list/1', {'page': 1}, None, None)
+        elapsed = time.perf_counter() - started
+        default_ok = response.status == 0 and elapsed < latency
+
+        started = time.perf_counter()
+        response = await client._send('GET', '/list/1', {'page': 1}, None, timeout / 2)
+        per_call_ok = response.status == 0 and time.perf_counter() - started < timeout
+    finally:
+        await client.close()
+        await server.stop()
+    if not (default_ok and per_call_ok):
+        raise SystemExit(f"TMDB timeouts are not enforced (client timeout {timeout}s, server latency {latency}s).")
+    print(f"timeouts: client and per-call TMDB timeouts enforced ({elapsed * 1000:.0f} ms against a {latency * 1000:.0f} ms server)")
+
+async def check_cold_add_remove(movies, server, ctx, movie_id):
+    # Adding a movie the list already has before the guild's copy is loaded,
+    # then removing it, must remove it from TMDB: the two queued changes
+    # can't cancel out when the bot couldn't know the movie was there
+    url = f"https://www.themoviedb.org/movie/{movie_id}"
+    error_rate, server.error_rate = server.error_rate, 0.0
+    try:
+        movies.guilds.states.clear()
+        await movies.bot.store.replace('1', [])
+        await movies.add_movie(ctx, url)
+        await movies.remove_movie(ctx, url)
+        await movies.outbox.drain()
+    finally:
+        server.error_rate = error_rate
+    if any(movie['id'] == movie_id for movie in server.items):
+        raise SystemExit(f"Movie {movie_id} is still on the list after an add and remove on a cold watchlist.")
+    print(f"cold add/remove: movie {movie_id} removed from TMDB")
+
+async def run_scenario(name, operation, iterations, server, monitor, setup=None):
+    latencies = []
+    requests_before = sum(server.requests.values())
+    discord_before = sum(fake_discord.calls.values())
+    monitor.reset()
+    for i in range(iterations):
+        if setup is not None:
+            await setup(i)
+        started = time.perf_counter()
+        await operation(i)
+        latencies.append(time.perf_counter() - started)
+    max_lag, blocked = monitor.summary()
+    return {
+        'scenario': name,
+        'n': iterations,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'tmdb_per_op': (sum(server.requests.values()) - requests_before) / iterations,
+        'discord_per_op': (sum(fake_discord.calls.values()) - discord_before) / iterations,
+        'max_lag_ms': max_lag * 1000,
+        'blocked_ms': blocked * 1000
+    }
+
+async def main(args):
+    server = FakeTMDB(list_size=args.list_size, latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    url = await server.start()
+    workdir = tempfile.mkdtemp(prefix='projectionist-bench-')
+    bot = await build_bot(url, workdir)
+    movies = bot.get_cog('MovieCommands')
+    authorization = bot.get_cog('Authorization')
+    monitor = LoopMonitor()
+    monitor.start()
+    results = []
+
+    try:
+        await check_timeouts()
+        ctx = FakeContext(guild_id=1)
+
+        async def cold(i):
+            # Forget every local copy so the next command starts from nothing
+            movies.guilds.states.clear()
+            await bot.store.replace('1', [])
+
+        results.append(await run_scenario(
+            'spin (cold)', lambda i: movies.spin_movie(ctx), args.iterations, server, monitor, setup=cold))
+        results.append(await run_scenario(
+            'remove (cold)', lambda i: movies.remove_movie(ctx, f"Movie {i + 1}"), args.iterations, server, monitor, setup=cold))
+
+        # Warm the cache once, then measure the steady state
+        await (await movies.guilds.get(1)).watchlist.refresh()
+        results.append(await run_scenario(
+            'spin', lambda i: movies.spin_movie(ctx), args.iterations, server, monitor))
+        results.append(await run_scenario(
+            'spin (filtered)', lambda i: movies.spin_movie(ctx, 'rating:6 decade:90s'), args.iterations, server, monitor))
+        results.append(await run_scenario(
+            'add', lambda i: movies.add_movie(ctx, f"bench film {i}"), args.iterations, server, monitor))
+        results.append(await run_scenario(
+            'remove', lambda i: movies.remove_movie(ctx, f"Movie {args.iterations + i + 1}"), args.iterations, server, monitor))
+
+        async def bulk_add(i):
+            # Ten titles in one command, confirmed from the menu
+            titles = [f"bulk film {i} {n}" for n in range(10)]
+            task = asyncio.ensure_future(movies.bulk_add(ctx, titles))
+            while not task.done() and not (ctx.channel.messages and ctx.channel.messages[-1].view):
+                await asyncio.sleep(0)
+            view = ctx.channel.messages[-1].view
+            await view.confirm(FakeInteraction(ctx.author))
+            await task
+            ctx.channel.messages.clear()
+
+        results.append(await run_scenario('add x10', bulk_add, max(1, args.iterations // 5), server, monitor))
+
+        async def authorize(i):
+            auth_ctx = FakeContext(guild_id=1)
+            await authorization.authorize.callback(authorization, auth_ctx)
+            view = auth_ctx.author.dm_channel.messages[-1].view
+            button = view.children[1]
+            await button.callback(FakeInteraction(auth_ctx.author))
+
+        results.append(await run_scenario('authorize', authorize, args.iterations, server, monitor))
+
+        # The last movie on the list; none of the scenarios above touch it
+        await check_cold_add_remove(movies, server, ctx, args.list_size)
+    finally:
+        await monitor.stop()
+        await bot.close()
+        await server.stop()
+
+    header = f"{'scenario':<18}{'n':>5}{'p50 ms':>10}{'p99 ms':>10}{'tmdb/op':>10}{'discord/op':>12}{'max lag ms':>12}{'blocked ms':>12}"
+    print(f"list_size={args.list_size} latency={args.latency}s error_rate={args.error_rate}")
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(
+            f"{result['scenario']:<18}{result['n']:>5}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+            f"{result['tmdb_per_op']:>10.2f}{result['discord_per_op']:>12.2f}{result['max_lag_ms']:>12.1f}{result['blocked_ms']:>12.1f}"
+        )
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Projectionist cogs.")
+    parser.add_argument('--list-size', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated TMDB latency in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of TMDB responses that are 429/500.")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -1,22 +1,40 @@
 import os
-import logging
+import time
 import asyncio
+import logging
+from .metrics import metrics
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Modules in this package that are shared helpers, not extensions
+HELPER_MODULES = {'checks', 'tmdb', 'watchlist', 'titles', 'store', 'cache', 'session_store', 'scheduler', 'enrichment', 'guilds', 'outbox', 'metrics', 'stalls', 'bulk_add', 'autocomplete', 'records'}
+
+metrics.describe('cog_load_seconds', 'histogram', "Time to load or reload each cog.")
+
+async def load_cog(bot, cog_name):
+    started = time.perf_counter()
+    try:
+        await bot.load_extension(f'cogs.{cog_name}')
+    except Exception as e:
+        logger.error(f'Failed to load cog {cog_name}: {e}')
+        return
+    elapsed = time.perf_counter() - started
+    metrics.observe('cog_load_seconds', elapsed, cog=cog_name)
+    logger.info(f'Successfully loaded cog: {cog_name} ({elapsed * 1000:.0f} ms)')
+
 async def setup(bot):
     COGS_DIR = os.path.dirname(__file__)
 
-    for filename in os.listdir(COGS_DIR):
-        if filename.endswith('.py') and filename != '__init__.py':
-            cog_name = filename[:-3]  # Remove the .py extension
-            if cog_name != 'checks':  # Skip loading checks.py as a cog
-                try:
-                    await bot.load_extension(f'cogs.{cog_name}')
-                    logger.info(f'Successfully loaded cog: {cog_name}')
-                except Exception as e:
-                    logger.error(f'Failed to load cog {cog_name}: {e}')
+    cog_names = sorted(
+        filename[:-3] for filename in os.listdir(COGS_DIR)  # Remove the .py extension
+        if filename.endswith('.py') and filename != '__init__.py' and filename[:-3] not in HELPER_MODULES  # Skip loading helper modules as cogs
+    )
+    # Imports run one at a time, but each cog's async setup (warm starts
+    # from SQLite and the like) overlaps with the others
+    started = time.perf_counter()
+    await asyncio.gather(*(load_cog(bot, cog_name) for cog_name in cog_names))
+    logger.info(f'Loaded {len(bot.cogs)} cogs in {(time.perf_counter() - started) * 1000:.0f} ms')
 
-def setup_cogs(bot):
-    asyncio.run(setup(bot))
+async def setup_cogs(bot):
+    await setup(bot)
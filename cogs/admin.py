@@ -0,0 +1,53 @@
+import time
+import logging
+from discord.ext import commands
+from . import HELPER_MODULES
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class Admin(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    def extension_for(self, name):
+        # Accept the module name (movie_commands) or the cog name (MovieCommands)
+        cog = self.bot.get_cog(name)
+        if cog is not None:
+            return type(cog).__module__
+        extension = f'cogs.{name}'
+        if name not in HELPER_MODULES and extension in self.bot.extensions:
+            return extension
+        return None
+
+    @commands.command(name='reload')
+    async def reload(self, ctx, name: str):
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.send("Only the bot owner can reload cogs.")
+            logger.warning(f"Unauthorized reload request by {ctx.author}")
+            return
+
+        extension = self.extension_for(name)
+        if extension is None:
+            loaded = ', '.join(sorted(loaded_extension.split('.')[-1] for loaded_extension in self.bot.extensions))
+            await ctx.send(f"No loaded cog named {name}. Loaded cogs: {loaded}.")
+            return
+
+        # The TMDB client, SQLite store, session store and cog state live
+        # outside the extension module, so they carry over to the new code.
+        # If the new version fails to load, discord.py keeps the old one.
+        started = time.perf_counter()
+        try:
+            await self.bot.reload_extension(extension)
+        except commands.ExtensionError as e:
+            await ctx.send(f"Failed to reload {name}, the previous version is still running: {e}")
+            logger.error(f"Failed to reload {extension}: {e}")
+            return
+        elapsed = time.perf_counter() - started
+        metrics.observe('cog_load_seconds', elapsed, cog=extension.split('.')[-1])
+        await ctx.send(f"Reloaded {name} in {elapsed * 1000:.0f} ms.")
+        logger.info(f"Reloaded {extension} in {elapsed * 1000:.0f} ms.")
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
+    logger.info('Admin cog loaded and command registered.')
@@ -1,70 +1,54 @@
-import os
-import json
-import requests
 import asyncio
 import logging
 import discord
 from discord.ext import commands
 from discord.ui import Button, View
+from .session_store import session_store
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-TMDB_TOKEN = os.getenv('TMDB_TOKEN')
-SESSION_FILE = 'tmdb_session.json'
 logger = logging.getLogger(__name__)
 
-def save_session_id(session_id):
-    with open(SESSION_FILE, 'w') as f:
-        json.dump({'session_id': session_id}, f)
-
-def load_session_id():
-    if os.path.exists(SESSION_FILE):
-        with open(SESSION_FILE, 'r') as f:
-            data = json.load(f)
-            return data.get('session_id')
-    return None
-
-def create_request_token():
-    url = 'https://api.themoviedb.org/3/authentication/token/new'
-    headers = {
-        'Authorization': f'Bearer {TMDB_TOKEN}',
-        'accept': 'application/json'
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        return response.json().get('request_token')
+async def create_request_token(tmdb):
+    response = await tmdb.create_request_token()
+    if response.status == 200:
+        return response.data.get('request_token')
     else:
-        logger.error(f"Failed to create request token: {response.status_code} - {response.text}")
+        logger.error(f"Failed to create request token: {response.status} - {response.text}")
         return None
 
-def create_session_id(request_token):
-    url = 'https://api.themoviedb.org/3/authentication/session/new'
-    headers = {
-        'Authorization': f'Bearer {TMDB_TOKEN}',
-        'Content-Type': 'application/json'
-    }
-    data = {
-        'request_token': request_token
-    }
-    response = requests.post(url, headers=headers, json=data)
-    try:
-        return response.json()
-    except json.JSONDecodeError:
+async def create_session_id(tmdb, request_token):
+    response = await tmdb.create_session_id(request_token)
+    if response.data is None:
         logger.error(f"Failed to decode session ID response: {response.text}")
         return {"error": "Invalid response"}
+    return response.data
 
 class Authorization(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.tmdb = bot.tmdb
 
     @commands.command(name='authorize')
     async def authorize(self, ctx):
+        # A DM sets the operator's default session
+        if ctx.guild is None and not await self.bot.is_owner(ctx.author):
+            await ctx.send("Run `!authorize` in a server to authorize it.")
+            logger.warning(f"Unauthorized default session request by {ctx.author}")
+            return
+        # A server's session is used for every list edit there
+        if ctx.guild is not None and not ctx.author.guild_permissions.manage_guild:
+            await ctx.send("You need the Manage Server permission to authorize this server.")
+            logger.warning(f"Unauthorized authorize attempt by {ctx.author}")
+            return
         logger.info("Starting authorization process...")
-        request_token = create_request_token()
+        request_token = await create_request_token(self.tmdb)
         if request_token:
             user = ctx.message.author
+            # Sessions are stored per guild; DMs set the default session
+            guild_id = ctx.guild.id if ctx.guild else None
             logger.info(f"Request token created: {request_token}")
             dm_channel = await user.create_dm()
             auth_url = f"https://www.themoviedb.org/authenticate/{request_token}"
@@ -81,10 +65,10 @@ class Authorization(commands.Cog):
                     return
                 await interaction.response.send_message("Checking authorization status...", ephemeral=True)
                 
-                session_id_response = create_session_id(request_token)
+                session_id_response = await create_session_id(self.tmdb, request_token)
                 if 'session_id' in session_id_response:
                     session_id = session_id_response['session_id']
-                    save_session_id(session_id)
+                    await asyncio.to_thread(session_store.save, session_id, guild_id)
                     await dm_channel.send("Authorization complete! Your session ID has been saved securely.")
                     logger.info("Session ID created and saved.")
                 elif session_id_response.get('status_code') != 17:
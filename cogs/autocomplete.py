@@ -0,0 +1,76 @@
+import os
+import time
+import asyncio
+import logging
+from .cache import TTLCache
+from .titles import normalize_title
+from .metrics import metrics
+
+# Wait this long for the user to stop typing before searching TMDB
+AUTOCOMPLETE_DEBOUNCE = float(os.getenv('AUTOCOMPLETE_DEBOUNCE', '0.35'))
+# Discord drops autocomplete answers after 3 seconds; stay well inside that
+AUTOCOMPLETE_BUDGET = float(os.getenv('AUTOCOMPLETE_BUDGET', '2.0'))
+AUTOCOMPLETE_MIN_CHARS = 2
+MAX_CHOICES = 25  # Discord's limit
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('autocomplete_seconds', 'histogram', "Time to answer an autocomplete request, by source.")
+
+class SearchSuggester:
+    # TMDB search suggestions for /watchlist add. Every keystroke sends an
+    # autocomplete request; only the last one of a burst (no newer keystroke
+    # from the same user within the debounce window) searches TMDB, and that
+    # search goes through the client's cache and single-flight. Superseded
+    # keystrokes answer from what the user was last shown.
+    def __init__(self, tmdb, debounce=AUTOCOMPLETE_DEBOUNCE, budget=AUTOCOMPLETE_BUDGET):
+        self.tmdb = tmdb
+        self.debounce = debounce
+        self.budget = budget
+        # user id -> number of the latest keystroke
+        self.generations = {}
+        # user id -> last suggestions returned
+        self.recent = TTLCache(maxsize=1024, ttl=300)
+        # Movies offered recently, so picking one needs no further lookup
+        self.movies = TTLCache(maxsize=1024, ttl=900)
+
+    def remember(self, user_id, movies):
+        for movie in movies:
+            self.movies.set(str(movie['id']), movie)
+        self.recent.set(user_id, movies)
+        return movies
+
+    async def suggest(self, user_id, query):
+        started = time.perf_counter()
+        source = 'cache'
+        try:
+            if len(normalize_title(query)) < AUTOCOMPLETE_MIN_CHARS:
+                source = 'short'
+                return []
+
+            response = self.tmdb.cached_search(query)
+            if response is not None:
+                return self.remember(user_id, response.data['results'][:MAX_CHOICES])
+
+            generation = self.generations.get(user_id, 0) + 1
+            self.generations[user_id] = generation
+            await asyncio.sleep(self.debounce)
+            if self.generations.get(user_id) != generation:
+                source = 'superseded'
+                return self.recent.get(user_id) or []
+            del self.generations[user_id]
+
+            source = 'tmdb'
+            try:
+                # The request keeps running past the timeout and lands in the
+                # cache for the next keystroke
+                response = await asyncio.wait_for(self.tmdb.search_movie(query), self.budget - self.debounce)
+            except asyncio.TimeoutError:
+                logger.warning(f"Autocomplete search for {query} ran out of time.")
+                return self.recent.get(user_id) or []
+            if response.status != 200:
+                logger.error(f"Autocomplete search failed: {response.status} - {response.text}")
+                return self.recent.get(user_id) or []
+            return self.remember(user_id, response.data['results'][:MAX_CHOICES])
+        finally:
+            metrics.observe('autocomplete_seconds', time.perf_counter() - started, source=source)
@@ -0,0 +1,152 @@
+import os
+import re
+import discord
+from discord.ui import Button, Select, View
+from .titles import normalize_title, release_year
+
+BULK_ADD_MAX_TITLES = int(os.getenv('BULK_ADD_MAX_TITLES', '25'))
+BULK_ADD_CANDIDATES = 3  # search results offered per title
+BULK_ADD_PAGE_SIZE = 5  # titles per page; 5 x 3 stays under Discord's 25 select options
+BULK_ADD_TIMEOUT = 120.0  # seconds
+
+MOVIE_URL = "https://www.themoviedb.org/movie/"
+
+def parse_titles(text):
+    # "Alien; Aliens\nhttps://www.themoviedb.org/movie/679 ..." -> one entry
+    # per title or URL, in order, without repeats
+    entries = []
+    seen = set()
+    for part in re.split(r'[;\n]+', text):
+        part = part.strip()
+        if MOVIE_URL in part:
+            # Pasted URLs are often only separated by spaces
+            pieces = [piece for piece in part.split() if piece.startswith(MOVIE_URL)]
+        else:
+            pieces = [part]
+        for piece in pieces:
+            key = normalize_title(piece) if not piece.startswith(MOVIE_URL) else piece
+            if piece and key not in seen:
+                seen.add(key)
+                entries.append(piece)
+    return entries
+
+def _label(movie):
+    year = release_year(movie)
+    label = f"{movie['title']} ({year})" if year else movie['title']
+    return label[:100]
+
+class BulkAddView(View):
+    # One message for a whole import: each page lists a few of the searched
+    # titles with a multi-select of their candidates, the best match of each
+    # preselected. Only the command's author can use the controls.
+    def __init__(self, author, results, is_listed, timeout=BULK_ADD_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.author = author
+        # [(query, [candidate movies])] in the order they were asked for
+        self.results = results
+        self.is_listed = is_listed
+        self.page = 0
+        self.pages = max(1, -(-len(results) // BULK_ADD_PAGE_SIZE))
+        self.confirmed = False
+        self.candidates = {}
+        self.selected = set()
+        for query, movies in results:
+            for rank, movie in enumerate(movies):
+                movie_id = str(movie['id'])
+                self.candidates.setdefault(movie_id, movie)
+                if rank == 0 and not is_listed(movie['id']):
+                    self.selected.add(movie_id)
+        self.render()
+
+    def page_results(self):
+        start = self.page * BULK_ADD_PAGE_SIZE
+        return self.results[start:start + BULK_ADD_PAGE_SIZE]
+
+    def chosen(self):
+        # Selected movies in the order their titles were given
+        ordered = []
+        for query, movies in self.results:
+            for movie in movies:
+                movie_id = str(movie['id'])
+                if movie_id in self.selected and movie_id not in ordered:
+                    ordered.append(movie_id)
+        return [self.candidates[movie_id] for movie_id in ordered]
+
+    def embed(self):
+        lines = []
+        for query, movies in self.page_results():
+            if not movies:
+                lines.append(f"**{query}**: not found")
+                continue
+            picked = [movie for movie in movies if str(movie['id']) in self.selected]
+            listed = [movie for movie in movies if self.is_listed(movie['id'])]
+            if picked:
+                status = ', '.join(_label(movie) for movie in picked)
+            elif listed:
+                status = f"{_label(listed[0])} is already in the watchlist"
+            else:
+                status = "skipped"
+            lines.append(f"**{query}**: {status}")
+        embed = discord.Embed(title=f"Add {len(self.selected)} of {len(self.results)} movies?", description='\n'.join(lines))
+        embed.set_footer(text=f"Page {self.page + 1}/{self.pages}. Pick the right matches below, then press Add selected.")
+        return embed
+
+    def render(self):
+        self.clear_items()
+
+        options = []
+        seen = set()
+        for query, movies in self.page_results():
+            for movie in movies:
+                movie_id = str(movie['id'])
+                if movie_id in seen or self.is_listed(movie['id']):
+                    continue
+                seen.add(movie_id)
+                options.append(discord.SelectOption(
+                    label=_label(movie), value=movie_id,
+                    description=f"for {query}"[:100], default=movie_id in self.selected
+                ))
+        if options:
+            select = Select(placeholder="Movies to add", min_values=0, max_values=len(options), options=options, row=0)
+            select.callback = self.make_select_callback(select, seen)
+            self.add_item(select)
+
+        previous_button = Button(label="Previous", style=discord.ButtonStyle.grey, disabled=self.page == 0, row=1)
+        previous_button.callback = self.make_page_callback(-1)
+        next_button = Button(label="Next", style=discord.ButtonStyle.grey, disabled=self.page >= self.pages - 1, row=1)
+        next_button.callback = self.make_page_callback(1)
+        confirm_button = Button(label="Add selected", style=discord.ButtonStyle.green, disabled=not self.selected, row=1)
+        confirm_button.callback = self.confirm
+        cancel_button = Button(label="Cancel", style=discord.ButtonStyle.red, row=1)
+        cancel_button.callback = self.cancel
+        for button in (previous_button, next_button, confirm_button, cancel_button):
+            self.add_item(button)
+
+    def make_select_callback(self, select, page_ids):
+        async def select_callback(interaction):
+            self.selected = (self.selected - page_ids) | set(select.values)
+            self.render()
+            await interaction.response.edit_message(embed=self.embed(), view=self)
+        return select_callback
+
+    def make_page_callback(self, step):
+        async def page_callback(interaction):
+            self.page = min(max(self.page + step, 0), self.pages - 1)
+            self.render()
+            await interaction.response.edit_message(embed=self.embed(), view=self)
+        return page_callback
+
+    async def confirm(self, interaction):
+        self.confirmed = True
+        self.stop()
+        await interaction.response.edit_message(view=None)
+
+    async def cancel(self, interaction):
+        self.stop()
+        await interaction.response.edit_message(content="No movies added.", embed=None, view=None)
+
+    async def interaction_check(self, interaction):
+        if interaction.user != self.author:
+            await interaction.response.send_message("You cannot use these controls.", ephemeral=True)
+            return False
+        return True
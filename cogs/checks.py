@@ -1,13 +1,4 @@
-import os
-import json
+from .session_store import load_session_id
 
-def load_session_id():
-    SESSION_FILE = 'tmdb_session.json'
-    if os.path.exists(SESSION_FILE):
-        with open(SESSION_FILE, 'r') as f:
-            data = json.load(f)
-            return data.get('session_id')
-    return None
-
-def is_authorized():
-    return load_session_id() is not None
+def is_authorized(guild_id=None, list_id=None):
+    return load_session_id(guild_id, list_id) is not None
@@ -0,0 +1,59 @@
+import io
+import logging
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+class Diagnostics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.stalls = bot.stalls
+
+    @commands.command(name='diagnostics')
+    async def diagnostics(self, ctx, action: str = 'status', threshold_ms: float = None):
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.send("Only the bot owner can change diagnostics.")
+            logger.warning(f"Unauthorized diagnostics request by {ctx.author}")
+            return
+
+        if action == 'on':
+            self.stalls.index_bot(self.bot)
+            self.stalls.enable(threshold_ms / 1000 if threshold_ms else None)
+            await ctx.send(f"Stall detection is on: loop stalls over {self.stalls.threshold * 1000:.0f} ms are logged and profiled.")
+        elif action == 'off':
+            self.stalls.disable()
+            await ctx.send("Stall detection is off.")
+        elif action == 'dump':
+            folded = self.stalls.folded()
+            if not folded:
+                await ctx.send("No stalls have been profiled yet.")
+                return
+            await ctx.send(
+                "Folded stacks from every stall so far; feed them to flamegraph.pl or speedscope.",
+                file=discord.File(io.BytesIO(folded.encode()), filename='stall_profile.folded')
+            )
+        elif action == 'reset':
+            self.stalls.reset()
+            await ctx.send("Stall profile cleared.")
+        elif action == 'status':
+            await self.show_status(ctx)
+        else:
+            await ctx.send("Invalid action. Use `!diagnostics on [threshold ms]`, `off`, `status`, `dump` or `reset`.")
+
+    async def show_status(self, ctx):
+        stalls = self.stalls
+        embed = discord.Embed(title="Diagnostics")
+        embed.add_field(name="Stall detection", value=f"{'on' if stalls.enabled else 'off'}, threshold {stalls.threshold * 1000:.0f} ms", inline=False)
+        embed.add_field(name="Stalls", value=f"{stalls.stalls} recorded, worst {stalls.worst * 1000:.0f} ms", inline=False)
+        last = stalls.last_stall
+        if last is not None:
+            embed.add_field(name="Last stall", value=(
+                f"{last['duration'] * 1000:.0f} ms in cog {last['cog'] or '?'}, command {last['command'] or '?'}\n"
+                f"at {last['location'] or 'unknown'}"
+            ), inline=False)
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Diagnostics(bot))
+    logger.info('Diagnostics cog loaded and command registered.')
@@ -0,0 +1,117 @@
+import os
+import re
+import asyncio
+import logging
+from .titles import normalize_title, release_year
+from .scheduler import lane, BACKGROUND
+
+ENRICH_BATCH_SIZE = int(os.getenv('ENRICH_BATCH_SIZE', '20'))
+ENRICH_CONCURRENCY = int(os.getenv('ENRICH_CONCURRENCY', '4'))
+
+logger = logging.getLogger(__name__)
+
+def compact_details(data):
+    return {
+        'runtime': data.get('runtime') or None,
+        'genres': [genre['name'] for genre in data.get('genres', [])]
+    }
+
+class MovieEnricher:
+    def __init__(self, tmdb, store=None, batch_size=ENRICH_BATCH_SIZE, concurrency=ENRICH_CONCURRENCY):
+        self.tmdb = tmdb
+        self.store = store
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        # movie id -> {'runtime': minutes, 'genres': [names]}
+        self.details = {}
+        self._failed = set()
+
+    async def load(self):
+        if self.store is not None:
+            self.details.update(await self.store.load_details())
+
+    def missing(self, items):
+        return [
+            str(movie['id']) for movie in items or []
+            if str(movie['id']) not in self.details and str(movie['id']) not in self._failed
+        ]
+
+    async def enrich(self, items, max_batches=None):
+        # Fetch details for items we haven't seen yet, one bounded batch at a time
+        pending = self.missing(items)
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        if max_batches is not None:
+            batches = batches[:max_batches]
+
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        enriched = 0
+        with lane(BACKGROUND):
+            for batch in batches:
+                async def fetch(movie_id):
+                    async with semaphore:
+                        response = await self.tmdb.get_movie_details(movie_id, cached=False)
+                    # A 200 with an empty or non-JSON body is retried next time
+                    if response.status == 200 and response.data is not None:
+                        return movie_id, compact_details(response.data)
+                    if response.status == 404:
+                        self._failed.add(movie_id)
+                    logger.warning(f"Failed to enrich movie {movie_id}: {response.status}")
+                    return movie_id, None
+
+                results = await asyncio.gather(*(fetch(movie_id) for movie_id in batch))
+                fetched = {movie_id: record for movie_id, record in results if record is not None}
+                self.details.update(fetched)
+                enriched += len(fetched)
+                if fetched and self.store is not None:
+                    await self.store.save_details(fetched)
+        if enriched:
+            logger.info(f"Enriched {enriched} watchlist items with movie details.")
+        return enriched
+
+# Spin filters, e.g. "genre:horror runtime:120 decade:80s rating:7"
+FILTER_KEYS = {'genre', 'runtime', 'decade', 'rating'}
+_DECADE = re.compile(r"^(\d{2}|\d{4})s?$")
+
+def parse_decade(value):
+    match = _DECADE.match(value.strip().lower().lstrip("'"))
+    if not match:
+        raise ValueError(f"Unknown decade: {value}")
+    year = int(match.group(1))
+    if year < 100:
+        year += 1900 if year >= 30 else 2000
+    return year - year % 10
+
+def parse_spin_filters(text):
+    filters = {}
+    for token in (text or '').split():
+        key, sep, value = token.partition(':')
+        key = key.lower()
+        if not sep or key not in FILTER_KEYS or not value:
+            raise ValueError(f"Unknown filter: {token}")
+        try:
+            if key == 'genre':
+                filters['genre'] = normalize_title(value.replace('-', ' ').replace('_', ' '))
+            elif key == 'runtime':
+                filters['runtime'] = int(value)
+            elif key == 'decade':
+                filters['decade'] = parse_decade(value)
+            elif key == 'rating':
+                filters['rating'] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for {key}: {value}")
+    return filters
+
+def matches_filters(movie, details, filters):
+    if 'rating' in filters and (movie.get('vote_average') or 0) < filters['rating']:
+        return False
+    if 'decade' in filters:
+        year = release_year(movie)
+        if not year or int(year) - int(year) % 10 != filters['decade']:
+            return False
+    if 'runtime' in filters:
+        if not details or not details['runtime'] or details['runtime'] > filters['runtime']:
+            return False
+    if 'genre' in filters:
+        if not details or filters['genre'] not in (normalize_title(genre) for genre in details['genres']):
+            return False
+    return True
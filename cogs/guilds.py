@@ -0,0 +1,75 @@
+import os
+import time
+import asyncio
+import logging
+from .watchlist import WatchlistCache
+
+DEFAULT_LIST_ID = os.getenv('TMDB_LIST_ID', '8303899')
+# Drop a guild's in-memory watchlist after this long without commands; the
+# SQLite snapshot keeps its next start warm
+GUILD_IDLE_TTL = float(os.getenv('GUILD_IDLE_TTL', '21600'))
+
+logger = logging.getLogger(__name__)
+
+class GuildState:
+    def __init__(self, guild_id, list_id, watchlist, refresh_interval):
+        self.guild_id = guild_id
+        self.list_id = list_id
+        self.watchlist = watchlist
+        self.refresh_interval = refresh_interval
+        self.next_refresh_at = 0.0
+        self.last_used = time.monotonic()
+        self._warm_start = None
+
+    async def ready(self):
+        if self._warm_start is None:
+            self._warm_start = asyncio.ensure_future(self.watchlist.warm_start())
+        await asyncio.shield(self._warm_start)
+
+class GuildRegistry:
+    def __init__(self, store, make_loader, refresh_interval, idle_ttl=GUILD_IDLE_TTL):
+        self.store = store
+        # make_loader(guild_id, list_id) returns the watchlist loader for a guild
+        self.make_loader = make_loader
+        self.refresh_interval = refresh_interval
+        self.idle_ttl = idle_ttl
+        self.list_ids = {}
+        self.states = {}
+
+    async def load(self):
+        self.list_ids = await self.store.load_guild_lists()
+
+    def list_id(self, guild_id):
+        return self.list_ids.get(str(guild_id), DEFAULT_LIST_ID)
+
+    async def get(self, guild_id):
+        state = self.states.get(guild_id)
+        if state is None:
+            list_id = self.list_id(guild_id)
+            watchlist = WatchlistCache(self.make_loader(guild_id, list_id), store=self.store, list_id=list_id)
+            watchlist.stale_while_revalidate = True
+            state = GuildState(guild_id, list_id, watchlist, self.refresh_interval)
+            self.states[guild_id] = state
+        state.last_used = time.monotonic()
+        await state.ready()
+        return state
+
+    async def set_list(self, guild_id, list_id):
+        self.list_ids[str(guild_id)] = str(list_id)
+        await self.store.save_guild_list(guild_id, list_id)
+        # The next command builds a fresh state for the new list
+        self.states.pop(guild_id, None)
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        for guild_id, state in list(self.states.items()):
+            if state.last_used < cutoff:
+                del self.states[guild_id]
+                logger.info(f"Dropped idle watchlist state for guild {guild_id}.")
+
+    def due(self, limit):
+        # States whose refresh is due, oldest first, capped per tick
+        now = time.monotonic()
+        due = [state for state in self.states.values() if state.next_refresh_at <= now]
+        due.sort(key=lambda state: state.next_refresh_at)
+        return due[:limit]
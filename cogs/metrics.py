@@ -0,0 +1,209 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import contextlib
+from aiohttp import web
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 disables the endpoint
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '0.5'))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (f'{key}="{_escape(value)}"' for key, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.descriptions = {}
+        # name -> callable returning [(metric, labels dict, value)] gauges
+        self.collectors = {}
+
+    def describe(self, name, kind, text):
+        self.descriptions[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, _labels(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, name, collector):
+        self.collectors[name] = collector
+
+    def remove_collector(self, name):
+        self.collectors.pop(name, None)
+
+    def gauges(self):
+        samples = []
+        for name, collector in list(self.collectors.items()):
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector {name} failed: {e}")
+        return samples
+
+    def series(self, name):
+        # {labels: histogram or value} for one metric
+        found = {labels: value for (metric, labels), value in self.counters.items() if metric == name}
+        found.update({labels: value for (metric, labels), value in self.histograms.items() if metric == name})
+        return found
+
+    def render(self):
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            kind, text = self.descriptions.get(name, (kind, ''))
+            if text:
+                lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        for name, labels, value in sorted(self.gauges(), key=lambda sample: (sample[0], _labels(sample[1]))):
+            header(name, 'gauge')
+            lines.append(f"{name}{_format_labels(_labels(labels))} {value}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('command_latency_seconds', 'histogram', "Latency of !p subcommands.")
+metrics.describe('tmdb_requests_total', 'counter', "TMDB requests by endpoint and status.")
+metrics.describe('tmdb_request_seconds', 'histogram', "TMDB request latency by endpoint.")
+metrics.describe('discord_api_requests_total', 'counter', "Discord REST calls by route.")
+metrics.describe('discord_api_request_seconds', 'histogram', "Discord REST latency by route.")
+metrics.describe('event_loop_lag_seconds', 'histogram', "How late the event loop wakes a sleeping sampler.")
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+def endpoint_label(path):
+    # /list/8303899/add_item -> /list/{id}/add_item
+    return _ID_SEGMENT.sub('/{id}', path)
+
+def instrument_discord_http(http, registry=metrics):
+    # Count every Discord REST call (sends, edits, reactions, ...) by route
+    original = http.request
+
+    async def request(route, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await original(route, **kwargs)
+        finally:
+            registry.inc('discord_api_requests_total', method=route.method, route=route.path)
+            registry.observe('discord_api_request_seconds', time.perf_counter() - started, method=route.method, route=route.path)
+
+    http.request = request
+
+class LoopLagMonitor:
+    def __init__(self, registry=metrics, interval=LOOP_LAG_INTERVAL):
+        self.registry = registry
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.registry.observe('event_loop_lag_seconds', lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+async def start_metrics_server(registry=metrics, host=METRICS_HOST, port=METRICS_PORT):
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
@@ -1,91 +1,413 @@
 import os
-import json
+import time
 import random
-import requests
 import logging
 import asyncio
 import discord
-from discord.ext import commands
+from contextlib import aclosing
+from discord import app_commands
+from discord.ext import commands, tasks
 from .checks import is_authorized  # Ensure the correct import path
+from .session_store import HOME_GUILD_IDS, load_session_id, session_store
+from .guilds import GuildRegistry
+from .titles import TitleIndex, release_year, split_year
+from .watchlist import same_movie
+from .records import MovieRecord
+from .scheduler import lane, BACKGROUND
+from .enrichment import MovieEnricher, parse_spin_filters, matches_filters
+from .outbox import ListOutbox, ADD, REMOVE
+from .metrics import metrics
+from .bulk_add import BulkAddView, parse_titles, BULK_ADD_MAX_TITLES, BULK_ADD_CANDIDATES
+from .autocomplete import SearchSuggester
 
-TMDB_API_KEY = os.getenv('TMDB_KEY')
-TMDB_TOKEN = os.getenv('TMDB_TOKEN')
-TMDB_LIST_ID = '8303899'
 TMDB_URL = "https://api.themoviedb.org/3"
 TMDB_IMAGE_URL = "https://image.tmdb.org/t/p/original"
 
-SESSION_FILE = 'tmdb_session.json'
+WATCHLIST_REFRESH_INTERVAL = float(os.getenv('WATCHLIST_REFRESH_INTERVAL', '120'))
+WATCHLIST_REFRESH_MAX_INTERVAL = float(os.getenv('WATCHLIST_REFRESH_MAX_INTERVAL', '1800'))
+# The refresher wakes this often and refreshes at most this many guilds per tick
+WATCHLIST_REFRESH_TICK = float(os.getenv('WATCHLIST_REFRESH_TICK', '15'))
+WATCHLIST_REFRESH_GUILDS_PER_TICK = int(os.getenv('WATCHLIST_REFRESH_GUILDS_PER_TICK', '10'))
+ENRICH_INTERVAL = float(os.getenv('ENRICH_INTERVAL', '60'))
+ENRICH_MAX_BATCHES = int(os.getenv('ENRICH_MAX_BATCHES', '5'))
+OUTBOX_FLUSH_INTERVAL = float(os.getenv('OUTBOX_FLUSH_INTERVAL', '2'))
+
+SUBCOMMANDS = {'add', 'remove', 'spin', 'list', 'setlist', 'stats', 'help'}
+
+SPIN_DURATION = .5  # seconds
+SPIN_SPEED = 0.1  # seconds per frame
 
 logger = logging.getLogger(__name__)
 
-def load_session_id():
-    if os.path.exists(SESSION_FILE):
-        with open(SESSION_FILE, 'r') as f:
-            data = json.load(f)
-            return data.get('session_id')
-    return None
-
-def fetch_tmdb_list():
-    session_id = load_session_id()
-    url = f"{TMDB_URL}/list/{TMDB_LIST_ID}"
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {TMDB_TOKEN}"
-    }
-
-    # Initial request to get the total number of pages
-    response = requests.get(url, headers=headers, params={"session_id": session_id, "language": "en-US", "page": 1})
-    
-    if response.status_code != 200:
-        logger.error(f"Failed to fetch TMDB list: {response.status_code} - {response.text}")
-        return []
-
-    data = response.json()
-    total_pages = data['total_pages']
-    all_items = data['items']
-
-    # Iterate through remaining pages
-    for page in range(2, total_pages + 1):
-        response = requests.get(url, headers=headers, params={"session_id": session_id, "language": "en-US", "page": page})
-        if response.status_code == 200:
-            data = response.json()
-            all_items.extend(data['items'])
-        else:
-            logger.error(f"Failed to fetch TMDB list on page {page}: {response.status_code} - {response.text}")
-            break
+def guild_key(ctx):
+    # Commands sent in DMs use the default list and session, for the owner only
+    return ctx.guild.id if ctx.guild else None
+
+def format_title(movie):
+    year = release_year(movie)
+    return f"{movie['title']} ({year})" if year else movie['title']
+
+def movie_url(movie_id):
+    return f"https://www.themoviedb.org/movie/{movie_id}"
+
+def movie_id_from_url(url):
+    # https://www.themoviedb.org/movie/603-the-matrix -> 603
+    return url.rstrip("/").split("/")[-1].split("-")[0].split("?")[0]
 
-    logger.info("Fetched all pages of TMDB list successfully.")
-    return all_items
+def list_id_from_url(url):
+    # https://www.themoviedb.org/list/8303899-the-wired-watchlist -> 8303899
+    return movie_id_from_url(url)
 
-def get_movie_details(movie_id):
-    url = f"{TMDB_URL}/movie/{movie_id}?language=en-US&api_key={TMDB_API_KEY}"
-    response = requests.get(url)
-    if response.status_code == 200:
+async def fetch_tmdb_list(tmdb, list_id, session_id):
+    result = await tmdb.fetch_list(list_id, session_id)
+
+    if not result.ok:
+        logger.error(f"Failed to fetch TMDB list {list_id}.")
+        return None
+
+    slowest = max(result.page_timings, key=result.page_timings.get)
+    timings = ', '.join(f"{page}: {seconds * 1000:.0f}ms" for page, seconds in sorted(result.page_timings.items()))
+    logger.debug(f"TMDB list page timings: {timings}")
+
+    if result.complete:
+        logger.info(f"Fetched all {result.total_pages} pages of TMDB list successfully (slowest page {slowest}: {result.page_timings[slowest] * 1000:.0f}ms).")
+    else:
+        # The caller decides whether a partial list is better than nothing
+        logger.warning(f"Fetched TMDB list with missing pages {result.missing_pages} of {result.total_pages}.")
+    return result
+
+def add_payload(state, movie):
+    # known_absent: the guild's list was loaded, so the movie really wasn't
+    # on it and a later remove may cancel this add in the outbox
+    return dict(movie.as_dict(), known_absent=state.watchlist.items is not None)
+
+async def scan_tmdb_list(tmdb, list_id, session_id, found):
+    # Stream the list and stop at the first page where found(page_items) is
+    # true, so a match on page 2 of 50 costs a few requests, not 50.
+    # Returns the items seen so far, or None if the list can't be fetched.
+    scanned = []
+    async with aclosing(tmdb.iter_list(list_id, session_id)) as pages:
+        async for page in pages:
+            if page.items is None:
+                if page.page == 1:
+                    logger.error(f"Failed to fetch TMDB list {list_id}.")
+                    return None
+                logger.warning(f"Skipping TMDB list page {page.page} that failed to load.")
+                continue
+            scanned.extend(page.items)
+            if found(page.items):
+                logger.info(f"Found a match on TMDB list page {page.page} of {page.total_pages}.")
+                break
+    return scanned
+
+async def probe_tmdb_list(tmdb, list_id, session_id):
+    # Only page 1, used to detect changes made outside the bot
+    response = await tmdb.get_list_page(list_id, session_id, page=1)
+    if response.status != 200 or response.data is None:
+        logger.warning(f"Failed to probe TMDB list: {response.status} - {response.text}")
+        return None
+    return response.data
+
+async def pick_random_movie(tmdb, state):
+    # Pick from the local copy when we have one, otherwise fetch only the
+    # page that holds a random index
+    if state.watchlist.items:
+        return random.choice(state.watchlist.items)
+    return await tmdb.fetch_random_list_item(state.list_id, load_session_id(state.guild_id, state.list_id))
+
+async def pick_filtered_movie(watchlist, enricher, filters):
+    # Filters are answered from the local copy and enriched details only
+    items = await watchlist.get()
+    candidates = [
+        movie for movie in items or []
+        if matches_filters(movie, enricher.details.get(str(movie['id'])), filters)
+    ]
+    return random.choice(candidates) if candidates else None
+
+async def get_movie_details(tmdb, movie_id):
+    response = await tmdb.get_movie_details(movie_id)
+    if response.status == 200:
         logger.info(f"Fetched movie details for movie ID {movie_id}.")
-        return response.json()
+        return response.data
     else:
-        logger.error(f"Failed to fetch movie details: {response.status_code} - {response.text}")
+        logger.error(f"Failed to fetch movie details: {response.status} - {response.text}")
         return None
 
 class MovieCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.tmdb = bot.tmdb
+        # After !reload, carry on with the previous instance's warm state
+        # rather than starting again from SQLite
+        state = bot.cog_state.get('MovieCommands')
+        self.restored = state is not None
+        if state is None:
+            state = {
+                # Watchlists, indexes and refresh schedules are kept per guild
+                'guilds': GuildRegistry(bot.store, None, WATCHLIST_REFRESH_INTERVAL),
+                'enricher': MovieEnricher(self.tmdb, bot.store),
+                # List changes are acknowledged locally and submitted to TMDB later
+                'outbox': ListOutbox(self.tmdb, bot.store, load_session_id),
+                # Debounced TMDB search behind /watchlist add autocomplete
+                'suggester': SearchSuggester(self.tmdb)
+            }
+        self.state = state
+        self.guilds = state['guilds']
+        self.enricher = state['enricher']
+        self.outbox = state['outbox']
+        self.suggester = state['suggester']
+        # Callbacks run this instance's code, even on inherited state
+        self.guilds.make_loader = self.make_loader
+        self.outbox.on_failed = self.outbox_failed
+        for guild_state in self.guilds.states.values():
+            guild_state.watchlist.loader = self.make_loader(guild_state.guild_id, guild_state.list_id)
+
+    def make_loader(self, guild_id, list_id):
+        async def load():
+            result = await fetch_tmdb_list(self.tmdb, list_id, load_session_id(guild_id, list_id))
+            if result is not None:
+                # Keep changes TMDB hasn't received yet
+                result.items = self.outbox.apply_pending(list_id, result.items)
+            return result
+        return load
+
+    async def cog_load(self):
+        if not self.restored:
+            await self.guilds.load()
+            await self.enricher.load()
+            await self.outbox.load()
+            self.bot.cog_state['MovieCommands'] = self.state
+            if session_store.session_id and not HOME_GUILD_IDS:
+                logger.warning(
+                    "A default TMDB session is saved but HOME_GUILD_IDS is not set, so servers can't use it; "
+                    "add your server's ID to HOME_GUILD_IDS or run !authorize there."
+                )
+        metrics.add_collector('movie_commands', self.collect_metrics)
+        self.refresh_watchlist.start()
+        self.enrich_watchlist.start()
+        self.flush_outbox.start()
 
-    def cog_check(self, ctx):
-        if not is_authorized():
+    async def cog_unload(self):
+        metrics.remove_collector('movie_commands')
+        self.refresh_watchlist.cancel()
+        self.enrich_watchlist.cancel()
+        # The bot closes the TMDB client and the store right after this, so
+        # let a drain already under way finish first
+        self.flush_outbox.cancel()
+        await self.outbox.wait_idle()
+
+    @tasks.loop(seconds=OUTBOX_FLUSH_INTERVAL)
+    async def flush_outbox(self):
+        # A tasks.loop stops for good on an unexpected exception, and the
+        # queued changes with it, so one bad tick is logged and skipped
+        try:
+            with lane(BACKGROUND):
+                # Shielded so cancelling the loop doesn't cut a submission short
+                await asyncio.shield(self.outbox.drain())
+        except Exception:
+            logger.exception("Outbox flush failed, retrying on the next tick.")
+
+    @flush_outbox.error
+    async def flush_outbox_error(self, error):
+        logger.error(f"Outbox flush failed: {error}")
+
+    def collect_metrics(self):
+        states = list(self.guilds.states.values())
+        samples = [
+            ('watchlist_guilds_loaded', {}, len(states)),
+            ('watchlist_items_cached', {}, sum(len(state.watchlist.items or []) for state in states)),
+            ('enriched_movies', {}, len(self.enricher.details))
+        ]
+        for key, value in self.outbox.stats().items():
+            samples.append((f'outbox_{key}', {}, value))
+        return samples
+
+    async def outbox_failed(self, entry, response):
+        # TMDB rejected the change: undo the optimistic add and re-sync soon
+        for state in self.guilds.states.values():
+            if state.list_id == entry['list_id']:
+                if entry['op'] == ADD:
+                    state.watchlist.remove(entry['media_id'])
+                state.next_refresh_at = 0.0
+
+        # The user was told the change was made, so tell them it wasn't
+        channel = self.bot.get_channel(entry['channel_id']) if entry.get('channel_id') else None
+        if channel is None:
+            return
+        title = (entry.get('payload') or {}).get('title') or f"movie {entry['media_id']}"
+        action = 'add' if entry['op'] == ADD else 'remove'
+        reason = (response.data or {}).get('status_message') or response.describe()
+        message = f"TMDB rejected the request to {action} {title}: {reason}"
+        if response.status == 401:
+            message += " Run `!authorize` to renew this server's TMDB session."
+        try:
+            await channel.send(message)
+        except discord.HTTPException as e:
+            logger.error(f"Failed to report a rejected list change to channel {entry['channel_id']}: {e}")
+
+    @tasks.loop(seconds=WATCHLIST_REFRESH_TICK)
+    async def refresh_watchlist(self):
+        self.guilds.evict_idle()
+        # List refreshes queue behind interactive TMDB calls
+        with lane(BACKGROUND):
+            for state in self.guilds.due(WATCHLIST_REFRESH_GUILDS_PER_TICK):
+                # An error must not end the loop (tasks.loop stops for good)
+                # or hold up the other guilds
+                try:
+                    await self.refresh_guild(state)
+                except Exception:
+                    logger.exception(f"Failed to refresh TMDB list {state.list_id} for guild {state.guild_id}.")
+                    state.next_refresh_at = time.monotonic() + state.refresh_interval
+
+    async def refresh_guild(self, state):
+        watchlist = state.watchlist
+        if watchlist.items is None or watchlist.missing_pages:
+            await watchlist.refresh()
+        else:
+            first_page = await probe_tmdb_list(self.tmdb, state.list_id, load_session_id(state.guild_id, state.list_id))
+            if first_page is None:
+                pass
+            elif watchlist.matches(first_page):
+                watchlist.touch()
+                # Nothing is changing, so poll less often
+                state.refresh_interval = min(state.refresh_interval * 2, WATCHLIST_REFRESH_MAX_INTERVAL)
+            else:
+                logger.info(f"TMDB list {state.list_id} changed outside the bot, re-syncing.")
+                await watchlist.refresh()
+                state.refresh_interval = WATCHLIST_REFRESH_INTERVAL
+        state.next_refresh_at = time.monotonic() + state.refresh_interval
+        if watchlist.missing_pages:
+            # The last fetch lost pages; try again on the next tick
+            state.next_refresh_at = 0.0
+
+    @refresh_watchlist.before_loop
+    async def before_refresh_watchlist(self):
+        await self.bot.wait_until_ready()
+
+    @refresh_watchlist.error
+    async def refresh_watchlist_error(self, error):
+        logger.error(f"Watchlist refresher failed: {error}")
+
+    @tasks.loop(seconds=ENRICH_INTERVAL)
+    async def enrich_watchlist(self):
+        # Fill in runtime and genres for new list items, a few batches per tick
+        items = [movie for state in list(self.guilds.states.values()) for movie in state.watchlist.items or []]
+        if not items:
+            return
+        # An error must not end the loop; tasks.loop stops for good on one
+        try:
+            await self.enricher.enrich(items, max_batches=ENRICH_MAX_BATCHES)
+        except Exception:
+            logger.exception("Watchlist enrichment failed, retrying on the next tick.")
+
+    @enrich_watchlist.before_loop
+    async def before_enrich_watchlist(self):
+        await self.bot.wait_until_ready()
+
+    @enrich_watchlist.error
+    async def enrich_watchlist_error(self, error):
+        logger.error(f"Watchlist enrichment failed: {error}")
+
+    async def cog_check(self, ctx):
+        # DMs act on the operator's default list, so only the owner may use them
+        if ctx.guild is None and not await self.bot.is_owner(ctx.author):
+            raise commands.CheckFailure("Use these commands in a server.")
+        guild_id = guild_key(ctx)
+        if not is_authorized(guild_id, self.guilds.list_id(guild_id)):
             raise commands.CheckFailure("You need to authorize first using `!authorize`.")
         return True
 
+    async def interaction_check(self, interaction):
+        # The slash-command counterpart of cog_check; autocomplete requests
+        # are checked too but cannot be answered with a message
+        message = None
+        if interaction.guild_id is None and not await self.bot.is_owner(interaction.user):
+            message = "Use these commands in a server."
+        elif not is_authorized(interaction.guild_id, self.guilds.list_id(interaction.guild_id)):
+            message = "You need to authorize first using `!authorize`."
+        if message is None:
+            return True
+        if interaction.type == discord.InteractionType.application_command:
+            await interaction.response.send_message(message, ephemeral=True)
+        return False
+
+    watchlist_group = app_commands.Group(name='watchlist', description="Manage this server's movie watchlist.")
+
+    @watchlist_group.command(name='add', description="Add a movie to the watchlist.")
+    @app_commands.describe(title="A movie title or TMDB URL")
+    async def slash_add(self, interaction: discord.Interaction, title: str):
+        ctx = await commands.Context.from_interaction(interaction)
+        with metrics.timer('command_latency_seconds', command='slash add'):
+            await ctx.defer()
+            # Picking a suggestion sends its TMDB URL; the movie is already known
+            movie = None
+            if title.startswith("https://www.themoviedb.org/movie/"):
+                movie = self.suggester.movies.peek(movie_id_from_url(title))
+            if movie is not None:
+                state = await self.guilds.get(guild_key(ctx))
+                await self.queue_add(ctx, state, MovieRecord.from_json(movie))
+            else:
+                await self.add_movie(ctx, title)
+
+    @slash_add.autocomplete('title')
+    async def add_autocomplete(self, interaction: discord.Interaction, current: str):
+        movies = await self.suggester.suggest(interaction.user.id, current)
+        return [app_commands.Choice(name=format_title(movie)[:100], value=movie_url(movie['id'])) for movie in movies]
+
+    @watchlist_group.command(name='remove', description="Remove a movie from the watchlist.")
+    @app_commands.describe(title="A movie in the watchlist")
+    async def slash_remove(self, interaction: discord.Interaction, title: str):
+        ctx = await commands.Context.from_interaction(interaction)
+        with metrics.timer('command_latency_seconds', command='slash remove'):
+            await ctx.defer()
+            state = await self.guilds.get(guild_key(ctx))
+            movie = None
+            if title.startswith("https://www.themoviedb.org/movie/"):
+                movie = state.watchlist.find(movie_id_from_url(title))
+            if movie is not None:
+                await self.queue_remove(ctx, state, movie['id'], format_title(movie))
+            else:
+                await self.remove_movie(ctx, title)
+
+    @slash_remove.autocomplete('title')
+    async def remove_autocomplete(self, interaction: discord.Interaction, current: str):
+        # Answered from the in-memory title index only, never from TMDB
+        started = time.perf_counter()
+        state = await self.guilds.get(interaction.guild_id)
+        movies = state.watchlist.index.complete(current)
+        metrics.observe('autocomplete_seconds', time.perf_counter() - started, source='index')
+        return [app_commands.Choice(name=format_title(movie)[:100], value=movie_url(movie['id'])) for movie in movies]
+
+    @watchlist_group.command(name='spin', description="Pick a random movie from the watchlist.")
+    @app_commands.describe(filters="Optional filters, e.g. genre:horror runtime:120 decade:80s rating:7")
+    async def slash_spin(self, interaction: discord.Interaction, filters: str = None):
+        ctx = await commands.Context.from_interaction(interaction)
+        with metrics.timer('command_latency_seconds', command='slash spin'):
+            await ctx.defer()
+            await self.spin_movie(ctx, filters)
+
     @commands.command(name='p')
     async def manage_movies(self, ctx, action: str, *, movie_name_or_url: str = None):
+        with metrics.timer('command_latency_seconds', command=action if action in SUBCOMMANDS else 'invalid'):
+            await self.dispatch_action(ctx, action, movie_name_or_url)
+
+    async def dispatch_action(self, ctx, action, movie_name_or_url):
         if action == 'add' and movie_name_or_url:
-            await self.add_movie(ctx, movie_name_or_url)
+            titles = parse_titles(movie_name_or_url)
+            if len(titles) > 1:
+                await self.bulk_add(ctx, titles)
+            else:
+                await self.add_movie(ctx, titles[0] if titles else movie_name_or_url)
         elif action == 'remove' and movie_name_or_url:
             await self.remove_movie(ctx, movie_name_or_url)
         elif action == 'spin':
-            await self.spin_movie(ctx)
+            await self.spin_movie(ctx, movie_name_or_url)
         elif action == 'list':
             await self.list_movies(ctx)
+        elif action == 'setlist' and movie_name_or_url:
+            await self.set_list(ctx, movie_name_or_url)
+        elif action == 'stats':
+            await self.show_stats(ctx)
         elif action == 'help':
             await self.show_help(ctx)
         else:
@@ -96,20 +418,13 @@ class MovieCommands(commands.Cog):
         logger.info(f"Attempting to add movie: {movie_name_or_url}")
         # Check if the input is a TMDB URL
         if movie_name_or_url.startswith("https://www.themoviedb.org/movie/"):
-            movie_id = movie_name_or_url.split("/")[-1]
-            movie = get_movie_details(movie_id)
+            movie_id = movie_id_from_url(movie_name_or_url)
+            movie = await get_movie_details(self.tmdb, movie_id)
         else:
             # Make a request to the TMDB API to search for the movie
-            params = {
-                'query': movie_name_or_url,
-                'include_adult': False,
-                'language': 'en-US',
-                'page': 1,
-                'api_key': TMDB_API_KEY
-            }
-            response = requests.get(f"{TMDB_URL}/search/movie", params=params)
-            if response.status_code == 200:
-                data = response.json()
+            response = await self.tmdb.search_movie(movie_name_or_url)
+            if response.status == 200:
+                data = response.data
                 if data['results']:
                     movie = data['results'][0]
                 else:
@@ -118,14 +433,8 @@ class MovieCommands(commands.Cog):
                 movie = None
         
         if movie:
-            movie_details = {
-                'title': movie['title'],
-                'overview': movie['overview'],
-                'release_date': movie['release_date'],
-                'vote_average': movie['vote_average'],
-                'poster_path': movie['poster_path'],
-                'id': movie['id']
-            }
+            state = await self.guilds.get(guild_key(ctx))
+            movie_details = MovieRecord.from_json(movie)
 
             # Create an embed message
             embed = discord.Embed(title=movie_details['title'], description=movie_details['overview'], url=f"{TMDB_URL}/movie/{movie['id']}")
@@ -143,34 +452,7 @@ class MovieCommands(commands.Cog):
             try:
                 reaction, user = await self.bot.wait_for('reaction_add', timeout=60.0, check=check)
                 if str(reaction.emoji) == '✅':
-                    watchlist_url = f"{TMDB_URL}/list/{TMDB_LIST_ID}/add_item"
-                    session_id = load_session_id()
-                    # Add the movie to the TMDB watchlist
-                    payload = {
-                        "media_type": "movie",
-                        "media_id": movie['id'],
-                        "session_id": session_id
-                    }
-                    headers = {
-                        "accept": "application/json",
-                        "content-type": "application/json",
-                        "Authorization": f"Bearer {TMDB_TOKEN}"
-                    }
-                    watchlist_response = requests.post(watchlist_url, json=payload, headers=headers)
-                    if watchlist_response.status_code == 201:
-                        logger.info(f"Successfully added movie to TMDB watchlist: {movie_details['title']}")
-                        await ctx.send(f"Added movie: {movie_details['title']}")
-                    elif watchlist_response.status_code == 403:
-                        error_data = watchlist_response.json()
-                        if error_data.get('status_code') == 8:
-                            await ctx.send(f"{movie_details['title']} is already in the watchlist.")
-                            logger.warning(f"Duplicate entry: {movie_details['title']} is already in the watchlist.")
-                        else:
-                            await ctx.send(f"Failed to add movie to TMDB watchlist: {watchlist_response.status_code} - {watchlist_response.text}")
-                            logger.error(f"Failed to add movie to TMDB watchlist: {watchlist_response.status_code} - {watchlist_response.text}")
-                    else:
-                        await ctx.send(f"Failed to add movie to TMDB watchlist: {watchlist_response.status_code} - {watchlist_response.text}")
-                        logger.error(f"Failed to add movie to TMDB watchlist: {watchlist_response.status_code} - {watchlist_response.text}")
+                    await self.queue_add(ctx, state, movie_details)
                 else:
                     await ctx.send(f"Movie not added: {movie_details['title']}")
                     logger.info(f"Movie not added: {movie_details['title']}")
@@ -188,62 +470,157 @@ class MovieCommands(commands.Cog):
             await ctx.send('Movie not found.')
             logger.warning(f"Movie not found: {movie_name_or_url}")
 
+    async def queue_add(self, ctx, state, movie_details):
+        if state.watchlist.find(movie_details['id']) is not None:
+            await ctx.send(f"{movie_details['title']} is already in the watchlist.")
+            logger.warning(f"Duplicate entry: {movie_details['title']} is already in the watchlist.")
+            return
+        # Record the change durably, then let the outbox submit it
+        await self.outbox.enqueue(state.guild_id, state.list_id, ADD, movie_details['id'], add_payload(state, movie_details), channel_id=ctx.channel.id)
+        state.watchlist.add(movie_details)
+        logger.info(f"Queued movie for the TMDB watchlist: {movie_details['title']}")
+        await ctx.send(f"Added movie: {movie_details['title']}")
+
+    async def queue_remove(self, ctx, state, movie_id, label):
+        # Record the removal durably, then let the outbox submit it
+        await self.outbox.enqueue(state.guild_id, state.list_id, REMOVE, movie_id, {'id': movie_id, 'title': label}, channel_id=ctx.channel.id)
+        state.watchlist.remove(movie_id)
+        await ctx.send(f"Removed movie: {label}")
+        logger.info(f"Removed movie: {label}")
+
+    async def find_candidates(self, title_or_url):
+        if title_or_url.startswith("https://www.themoviedb.org/movie/"):
+            movie = await get_movie_details(self.tmdb, movie_id_from_url(title_or_url))
+            return [movie] if movie else []
+        response = await self.tmdb.search_movie(title_or_url)
+        if response.status != 200:
+            logger.error(f"Failed to search for {title_or_url}: {response.status} - {response.text}")
+            return []
+        return response.data['results'][:BULK_ADD_CANDIDATES]
+
+    async def bulk_add(self, ctx, titles):
+        if len(titles) > BULK_ADD_MAX_TITLES:
+            await ctx.send(f"Add at most {BULK_ADD_MAX_TITLES} movies at a time.")
+            logger.warning(f"Bulk add of {len(titles)} titles refused.")
+            return
+        logger.info(f"Attempting to add {len(titles)} movies: {titles}")
+        state = await self.guilds.get(guild_key(ctx))
+        # All searches run at once; the scheduler keeps them under TMDB's rate limit
+        results = await asyncio.gather(*(self.find_candidates(title) for title in titles))
+
+        view = BulkAddView(ctx.author, list(zip(titles, results)), lambda movie_id: state.watchlist.find(movie_id) is not None)
+        if not view.candidates:
+            await ctx.send('None of those movies were found.')
+            logger.warning(f"No movies found for bulk add: {titles}")
+            return
+
+        msg = await ctx.send(embed=view.embed(), view=view)
+        if await view.wait():
+            await msg.edit(content="No confirmation received, no movies added.", view=None)
+            logger.warning("Bulk add timed out.")
+            return
+        if not view.confirmed:
+            logger.info("Bulk add cancelled.")
+            return
+
+        # Skip anything that reached the list while the menu was open
+        chosen = [MovieRecord.from_json(movie) for movie in view.chosen() if state.watchlist.find(movie['id']) is None]
+        if not chosen:
+            await ctx.send("No new movies to add.")
+            return
+        # One transaction for the batch; the next outbox drain submits it
+        await self.outbox.enqueue_many(
+            state.guild_id, state.list_id, ADD, [(movie['id'], add_payload(state, movie)) for movie in chosen], channel_id=ctx.channel.id
+        )
+        for movie in chosen:
+            state.watchlist.add(movie)
+        titles_added = ', '.join(format_title(movie) for movie in chosen)
+        await ctx.send(f"Added {len(chosen)} movies: {titles_added}")
+        logger.info(f"Queued {len(chosen)} movies for the TMDB watchlist: {titles_added}")
+
     async def remove_movie(self, ctx, movie_name_or_url):
         logger.info(f"Attempting to remove movie: {movie_name_or_url}")
-        movies_from_tmdb = fetch_tmdb_list()
+        state = await self.guilds.get(guild_key(ctx))
+        is_url = movie_name_or_url.startswith("https://www.themoviedb.org/movie/")
+        if state.watchlist.items is None:
+            # Nothing cached for this guild yet: scan the list page by page.
+            # An id or a title with its year names one movie, so the scan
+            # stops at the page holding it. A bare title can match several
+            # movies on different pages, and pages arrive out of order, so
+            # those scan the whole list before deciding. The background
+            # refresher fills the cache afterwards.
+            if is_url:
+                target = movie_id_from_url(movie_name_or_url)
+                found = lambda items: any(same_movie(movie['id'], target) for movie in items)
+            elif split_year(movie_name_or_url)[1]:
+                found = lambda items: bool(TitleIndex(items).lookup(movie_name_or_url))
+            else:
+                found = lambda items: False
+            movies_from_tmdb = await scan_tmdb_list(self.tmdb, state.list_id, load_session_id(state.guild_id, state.list_id), found)
+            index = TitleIndex(movies_from_tmdb or ())
+        else:
+            movies_from_tmdb = await state.watchlist.get()
+            index = state.watchlist.index
         if movies_from_tmdb:
             # Check if the input is a TMDB URL
-            if movie_name_or_url.startswith("https://www.themoviedb.org/movie/"):
-                movie_id_to_remove = movie_name_or_url.split("/")[-1]
+            if is_url:
+                movie_id_to_remove = movie_id_from_url(movie_name_or_url)
+                if index.movies.get(str(movie_id_to_remove)) is None:
+                    movie_id_to_remove = None
             else:
-                # Search for the movie ID to remove by name
+                # Look the title up in the watchlist index
                 movie_id_to_remove = None
-                for movie in movies_from_tmdb:
-                    if movie['title'].lower() == movie_name_or_url.lower():
-                        movie_id_to_remove = movie['id']
-                        break
-            
+                matches = index.lookup(movie_name_or_url)
+                if len(matches) == 1:
+                    movie_id_to_remove = matches[0]['id']
+                elif len(matches) > 1:
+                    options = ', '.join(format_title(movie) for movie in matches)
+                    await ctx.send(f"Several movies match {movie_name_or_url}: {options}. Add the year to pick one.")
+                    logger.warning(f"Ambiguous remove request: {movie_name_or_url}")
+                    return
+
             if movie_id_to_remove:
-                # Remove the movie from the TMDB list
-                url = f"{TMDB_URL}/list/{TMDB_LIST_ID}/remove_item"
-                session_id = load_session_id()
-                payload = { "media_id": movie_id_to_remove, "session_id": session_id }
-                headers = {
-                    "accept": "application/json",
-                    "content-type": "application/json",
-                    "Authorization": f"Bearer {TMDB_TOKEN}"
-                }
-                response = requests.post(url, json=payload, headers=headers)
-                
-                if response.status_code == 200:
-                    await ctx.send(f"Removed movie: {movie_name_or_url}")
-                    logger.info(f"Removed movie: {movie_name_or_url}")
-                else:
-                    await ctx.send(f"Failed to remove movie from TMDB list: {response.status_code} - {response.text}")
-                    logger.error(f"Failed to remove movie from TMDB list: {response.status_code} - {response.text}")
+                await self.queue_remove(ctx, state, movie_id_to_remove, movie_name_or_url)
             else:
-                await ctx.send(f"Movie not found in the list: {movie_name_or_url}")
+                candidates = index.search(movie_name_or_url)
+                if candidates:
+                    options = ', '.join(format_title(movie) for movie in candidates)
+                    await ctx.send(f"Movie not found in the list: {movie_name_or_url}. Did you mean: {options}?")
+                else:
+                    await ctx.send(f"Movie not found in the list: {movie_name_or_url}")
                 logger.warning(f"Movie not found in the list: {movie_name_or_url}")
         else:
             await ctx.send('Failed to fetch the list of movies.')
             logger.error('Failed to fetch the list of movies.')
         
-    async def spin_movie(self, ctx):
-        logger.info("Spinning the wheel to choose a random movie.")
-        movies_from_tmdb = fetch_tmdb_list()
-        if movies_from_tmdb:
+    async def spin_movie(self, ctx, filters=None):
+        state = await self.guilds.get(guild_key(ctx))
+        if filters:
+            try:
+                spin_filters = parse_spin_filters(filters)
+            except ValueError as e:
+                await ctx.send(f"{e}. Filters are genre:, runtime:, decade: and rating:.")
+                logger.warning(f"Invalid spin filters: {filters}")
+                return
+            logger.info(f"Spinning the wheel with filters: {spin_filters}")
+            chosen_movie = await pick_filtered_movie(state.watchlist, self.enricher, spin_filters)
+            empty_message = 'No movies in the TMDB list match those filters.'
+        else:
+            logger.info("Spinning the wheel to choose a random movie.")
+            chosen_movie = await pick_random_movie(self.tmdb, state)
+            empty_message = 'No movies in the TMDB list to choose from.'
+
+        if chosen_movie:
             emojis = ["🟥", "🟨", "🟩", "🟦"]
-            spin_duration = .5  # seconds
-            spin_speed = 0.1  # seconds per frame
-            total_frames = int(spin_duration / spin_speed)
+            spin_speed = SPIN_SPEED
+            total_frames = int(SPIN_DURATION / spin_speed) if spin_speed else 0
 
             msg = await ctx.send("Spinning...")
             for i in range(total_frames):
                 frame = ''.join([emojis[(i + j) % len(emojis)] for j in range(4)])
                 await msg.edit(content=f"Spinning... {frame}")
                 await asyncio.sleep(spin_speed)
-            
-            chosen_movie = random.choice(movies_from_tmdb)
+
             embed = discord.Embed(title=chosen_movie['title'], description=chosen_movie['overview'], url=f"{TMDB_URL}/movie/{chosen_movie['id']}")
             embed.set_image(url=f"{TMDB_IMAGE_URL}{chosen_movie['poster_path']}")
             embed.add_field(name="Release Date", value=chosen_movie['release_date'], inline=True)
@@ -252,20 +629,124 @@ class MovieCommands(commands.Cog):
             await msg.edit(content="The chosen movie is:", embed=embed)
             logger.info(f"The chosen movie is: {chosen_movie['title']}")
         else:
-            await ctx.send('No movies in the TMDB list to choose from.')
-            logger.warning('No movies in the TMDB list to choose from.')
+            await ctx.send(empty_message)
+            logger.warning(empty_message)
 
     async def list_movies(self, ctx):
-        embed = discord.Embed(title='The Wired Watchlist', url=f"https://www.themoviedb.org/list/8303899-the-wired-watchlist")
+        list_id = self.guilds.list_id(guild_key(ctx))
+        if list_id == '8303899':
+            embed = discord.Embed(title='The Wired Watchlist', url=f"https://www.themoviedb.org/list/8303899-the-wired-watchlist")
+        else:
+            embed = discord.Embed(title='Watchlist', url=f"https://www.themoviedb.org/list/{list_id}")
         await ctx.send(embed=embed)
         logger.info("Provided the watchlist link.")
 
+    async def set_list(self, ctx, list_id_or_url):
+        if ctx.guild is None or not ctx.author.guild_permissions.manage_guild:
+            await ctx.send("You need the Manage Server permission to change this server's watchlist.")
+            logger.warning(f"Unauthorized setlist attempt by {ctx.author}")
+            return
+
+        list_id = list_id_from_url(list_id_or_url)
+        if not list_id.isdigit():
+            await ctx.send(f"That doesn't look like a TMDB list: {list_id_or_url}")
+            return
+
+        # Other lists are edited with this server's own session, never the
+        # operator's default one
+        session_id = session_store.guild_session(ctx.guild.id)
+        if session_id is None:
+            await ctx.send("Run `!authorize` in this server first; other lists are changed with this server's own TMDB session.")
+            return
+
+        # Make sure the list exists and this server's session can read it
+        first_page = await probe_tmdb_list(self.tmdb, list_id, session_id)
+        if first_page is None:
+            await ctx.send(f"Could not read TMDB list {list_id}. Check the ID and that this server is authorized.")
+            return
+
+        await self.guilds.set_list(ctx.guild.id, list_id)
+        await ctx.send(f"This server's watchlist is now: {first_page.get('name') or list_id}")
+        logger.info(f"Guild {ctx.guild.id} switched to TMDB list {list_id}")
+
+    async def show_stats(self, ctx):
+        is_admin = ctx.guild is not None and ctx.author.guild_permissions.administrator
+        if not is_admin and not await self.bot.is_owner(ctx.author):
+            await ctx.send("Only server administrators can view bot stats.")
+            logger.warning(f"Unauthorized stats request by {ctx.author}")
+            return
+
+        embed = discord.Embed(title="Projectionist Stats")
+
+        lines = []
+        for labels, histogram in sorted(metrics.series('command_latency_seconds').items()):
+            command = dict(labels)['command']
+            lines.append(f"{command}: {histogram.count} calls, avg {histogram.mean * 1000:.0f} ms, p99 ≤ {histogram.quantile(0.99) * 1000:.0f} ms")
+        embed.add_field(name="Commands", value='\n'.join(lines) or "No commands yet.", inline=False)
+
+        requests = {}
+        errors = 0
+        for labels, count in metrics.series('tmdb_requests_total').items():
+            labels = dict(labels)
+            requests[labels['endpoint']] = requests.get(labels['endpoint'], 0) + count
+            if not labels['status'].startswith('2'):
+                errors += count
+        lines = []
+        for labels, histogram in sorted(metrics.series('tmdb_request_seconds').items()):
+            endpoint = dict(labels)['endpoint']
+            lines.append(f"{endpoint}: {requests.get(endpoint, 0)}, avg {histogram.mean * 1000:.0f} ms")
+        lines.append(f"Non-2xx responses: {errors}")
+        embed.add_field(name="TMDB", value='\n'.join(lines), inline=False)
+
+        cache_stats = self.tmdb.cache_stats()
+        embed.add_field(name="Caches", value=(
+            f"search: {cache_stats['search']['hit_ratio']:.0%} hits ({cache_stats['search']['size']} entries)\n"
+            f"details: {cache_stats['details']['hit_ratio']:.0%} hits ({cache_stats['details']['size']} entries)\n"
+            f"coalesced lookups: {cache_stats['coalesced']}"
+        ), inline=False)
+
+        discord_calls = sorted(
+            ((dict(labels), count) for labels, count in metrics.series('discord_api_requests_total').items()),
+            key=lambda pair: -pair[1]
+        )
+        lines = [f"{labels['method']} {labels['route']}: {count}" for labels, count in discord_calls[:5]]
+        embed.add_field(name="Discord API", value='\n'.join(lines) or "No calls yet.", inline=False)
+
+        outbox_stats = self.outbox.stats()
+        lines = [
+            f"pending: {outbox_stats['pending']}, submitted: {outbox_stats['submitted']}, "
+            f"coalesced: {outbox_stats['coalesced']}, rejected by TMDB: {outbox_stats['dead_letters']}"
+        ]
+        for entry in self.outbox.dead_letters[-3:]:
+            title = (entry.get('payload') or {}).get('title') or f"movie {entry['media_id']}"
+            lines.append(f"{entry['op']} {title} on list {entry['list_id']}: {entry['error']}"[:200])
+        embed.add_field(name="List changes", value='\n'.join(lines), inline=False)
+
+        scheduler_stats = self.tmdb.scheduler.stats()
+        lines = [
+            f"guilds loaded: {len(self.guilds.states)}, outbox pending: {len(self.outbox)}",
+            f"TMDB queue: {scheduler_stats['lanes']['interactive']['queued']} interactive, "
+            f"{scheduler_stats['lanes']['background']['queued']} background, {scheduler_stats['throttled']} throttled"
+        ]
+        loop_lag = getattr(self.bot, 'loop_lag', None)
+        if loop_lag is not None:
+            lines.append(f"event loop lag: {loop_lag.last_lag * 1000:.1f} ms now, {loop_lag.max_lag * 1000:.1f} ms max")
+        embed.add_field(name="Runtime", value='\n'.join(lines), inline=False)
+
+        await ctx.send(embed=embed)
+        logger.info("Displayed bot stats.")
+
     async def show_help(self, ctx):
         embed = discord.Embed(title="Movie Wheel Bot Commands", description="Here are the available commands:")
         embed.add_field(name="!mw add <movie name or URL>", value="Search for a movie by name or add it directly using the TMDB URL.", inline=False)
+        embed.add_field(name="!mw add <title>; <title>; ...", value="Add several movies at once. Separate titles or TMDB URLs with semicolons or new lines, then confirm the matches in one menu.", inline=False)
         embed.add_field(name="!mw remove <movie name or URL>", value="Remove a movie from the watchlist by name or TMDB URL.", inline=False)
         embed.add_field(name="!mw spin", value="Spin the wheel to choose a random movie from the watchlist.", inline=False)
+        embed.add_field(name="!mw spin [genre:<name>] [runtime:<max minutes>] [decade:<80s>] [rating:<min>]", value="Spin the wheel over only the movies that match the filters.", inline=False)
         embed.add_field(name="!mw list", value="Get the link to the watchlist.", inline=False)
+        embed.add_field(name="!mw setlist <list ID or URL>", value="Use a different TMDB list for this server (requires Manage Server).", inline=False)
+        embed.add_field(name="/watchlist add, /watchlist remove, /watchlist spin", value="Slash-command versions of add, remove and spin, with title suggestions as you type.", inline=False)
+        embed.add_field(name="!mw stats", value="Show runtime performance stats (administrators only).", inline=False)
         embed.add_field(name="!mw help", value="Show this help message.", inline=False)
         await ctx.send(embed=embed)
         logger.info("Displayed the help message.")
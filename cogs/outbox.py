@@ -0,0 +1,199 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from .records import MovieRecord
+
+OUTBOX_CONCURRENCY = int(os.getenv('OUTBOX_CONCURRENCY', '4'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+
+ADD = 'add'
+REMOVE = 'remove'
+
+logger = logging.getLogger(__name__)
+
+def _net_ops(entries):
+    # Group pending entries per (list, movie). Once a guild's list is loaded
+    # the bot only queues an add for a movie it doesn't have and a remove for
+    # one it does, so the ops for a movie alternate: an unattempted even run
+    # cancels out, otherwise the last op stands.
+    groups = {}
+    for entry in entries:
+        groups.setdefault((entry['list_id'], entry['media_id']), []).append(entry)
+    return groups.values()
+
+def _cancels_out(group):
+    # An add and a remove only cancel if TMDB can't have seen either: once
+    # an entry has been attempted (it may have landed before the request
+    # timed out or failed), the last op has to be submitted to be sure. The
+    # same goes for an add queued before the list was loaded (no
+    # known_absent in its payload): TMDB may already have had the movie.
+    if group[0]['op'] == group[-1]['op'] or any(entry['attempts'] for entry in group):
+        return False
+    return all((entry['payload'] or {}).get('known_absent') for entry in group if entry['op'] == ADD)
+
+class ListOutbox:
+    def __init__(self, tmdb, store, session_for, on_failed=None, concurrency=OUTBOX_CONCURRENCY):
+        self.tmdb = tmdb
+        self.store = store
+        # session_for(guild_id, list_id) returns the TMDB session to submit with
+        self.session_for = session_for
+        # on_failed(entry, response) is awaited when TMDB rejects an op for good
+        self.on_failed = on_failed
+        self.concurrency = concurrency
+        # In-memory mirror of the outbox table, in seq order
+        self.entries = []
+        # Ops TMDB rejected for good (expired session, list not owned, ...),
+        # kept in the table rather than deleted so they stay visible
+        self.dead_letters = []
+        self.submitted = 0
+        self.coalesced = 0
+        self.failed = 0
+        # Two drains at once (e.g. old and new flush loops around a cog
+        # reload) would submit the same entries twice
+        self._drain_lock = asyncio.Lock()
+
+    async def load(self):
+        self.entries = await self.store.outbox_load()
+        self.dead_letters = await self.store.outbox_load(failed=True)
+        if self.entries:
+            logger.info(f"Loaded {len(self.entries)} pending list changes from the outbox.")
+        if self.dead_letters:
+            logger.warning(f"{len(self.dead_letters)} list changes in the outbox were rejected by TMDB.")
+
+    async def enqueue(self, guild_id, list_id, op, media_id, payload=None, channel_id=None):
+        await self.enqueue_many(guild_id, list_id, op, [(media_id, payload)], channel_id)
+
+    async def enqueue_many(self, guild_id, list_id, op, changes, channel_id=None):
+        # Durable before we acknowledge the change to the user; a batch is
+        # written in one transaction and submitted by the same drain.
+        # channel_id is where to report the change if TMDB rejects it.
+        seqs = await self.store.outbox_append_many(guild_id, list_id, op, changes, channel_id)
+        for seq, (media_id, payload) in zip(seqs, changes):
+            self.entries.append({
+                'seq': seq, 'guild_id': guild_id, 'list_id': str(list_id), 'op': op,
+                'media_id': int(media_id), 'payload': payload, 'attempts': 0, 'next_attempt_at': 0,
+                'channel_id': channel_id
+            })
+
+    def __len__(self):
+        return len(self.entries)
+
+    def apply_pending(self, list_id, items):
+        # Re-apply changes TMDB hasn't seen yet on top of a freshly fetched list
+        pending = [entry for entry in self.entries if entry['list_id'] == str(list_id)]
+        if not pending:
+            return items
+        removed = set()
+        added = []
+        for group in _net_ops(pending):
+            if _cancels_out(group):
+                continue
+            last = group[-1]
+            if last['op'] == REMOVE:
+                removed.add(str(last['media_id']))
+            elif last['payload']:
+                added.append(MovieRecord.from_json(last['payload']))
+        present = {str(movie['id']) for movie in items}
+        items = [movie for movie in items if str(movie['id']) not in removed]
+        items.extend(movie for movie in added if str(movie['id']) not in present)
+        return items
+
+    async def _forget(self, seqs):
+        seqs = set(seqs)
+        self.entries = [entry for entry in self.entries if entry['seq'] not in seqs]
+        await self.store.outbox_delete(sorted(seqs))
+
+    async def _submit(self, entry):
+        session_id = self.session_for(entry['guild_id'], entry['list_id'])
+        if entry['op'] == ADD:
+            response = await self.tmdb.add_item(entry['list_id'], session_id, entry['media_id'])
+            # 8 means the movie is already on the list
+            done = response.status == 201 or (response.status == 403 and (response.data or {}).get('status_code') == 8)
+        else:
+            response = await self.tmdb.remove_item(entry['list_id'], session_id, entry['media_id'])
+            done = response.ok
+        return done, response
+
+    async def drain(self):
+        async with self._drain_lock:
+            return await self._drain()
+
+    async def wait_idle(self):
+        # Returns once a drain in progress has finished
+        async with self._drain_lock:
+            pass
+
+    async def _drain(self):
+        if not self.entries:
+            return 0
+
+        now = time.time()
+        cancelled = []
+        due = []
+        for group in _net_ops(self.entries):
+            if _cancels_out(group):
+                # add then remove (or the reverse) before TMDB saw either
+                cancelled.extend(entry['seq'] for entry in group)
+            elif group[-1]['next_attempt_at'] <= now:
+                due.append(group)
+        if cancelled:
+            self.coalesced += len(cancelled)
+            await self._forget(cancelled)
+
+        # TMDB's v3 list API takes one item per call, so a batch is a set of
+        # concurrent submissions rather than a single request
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def submit(group):
+            entry = group[-1]
+            seqs = [item['seq'] for item in group]
+            async with semaphore:
+                done, response = await self._submit(entry)
+            if done:
+                self.submitted += 1
+                self.coalesced += len(group) - 1
+                await self._forget(seqs)
+                return 1
+
+            attempts = entry['attempts'] + 1
+            if response.retryable or response.status == 0:
+                if attempts < OUTBOX_MAX_ATTEMPTS:
+                    delay = min(600, 5 * 2 ** attempts) + random.uniform(0, 5)
+                    for item in group:
+                        item['attempts'] = attempts
+                        item['next_attempt_at'] = time.time() + delay
+                    await self.store.outbox_defer(seqs, attempts, entry['next_attempt_at'], f"{response.status} - {response.text}")
+                    logger.warning(f"Deferred {entry['op']} of {entry['media_id']} on list {entry['list_id']}: {response.status}")
+                    return 0
+
+            await self._dead_letter(group, response)
+            return 0
+
+        results = await asyncio.gather(*(submit(group) for group in due))
+        return sum(results)
+
+    async def _dead_letter(self, group, response):
+        # Keep the op that failed, drop the ones it superseded
+        entry = group[-1]
+        self.failed += 1
+        entry['failed_at'] = time.time()
+        entry['error'] = f"{response.status} - {response.text}"
+        logger.error(f"Giving up on {entry['op']} of {entry['media_id']} on list {entry['list_id']}: {entry['error']}")
+        await self.store.outbox_fail(entry['seq'], entry['failed_at'], entry['error'])
+        self.entries = [item for item in self.entries if item['seq'] != entry['seq']]
+        if len(group) > 1:
+            await self._forget(item['seq'] for item in group[:-1])
+        self.dead_letters.append(entry)
+        if self.on_failed is not None:
+            try:
+                await self.on_failed(entry, response)
+            except Exception as e:
+                logger.error(f"Outbox failure handler failed: {e}")
+
+    def stats(self):
+        return {
+            'pending': len(self.entries), 'submitted': self.submitted, 'coalesced': self.coalesced,
+            'failed': self.failed, 'dead_letters': len(self.dead_letters)
+        }
@@ -0,0 +1,43 @@
+MOVIE_FIELDS = ('id', 'title', 'overview', 'release_date', 'vote_average', 'poster_path')
+
+class MovieRecord:
+    # A watchlist item: only the fields the embeds, index and filters use,
+    # in slots rather than a per-item dict holding TMDB's full JSON. It
+    # reads like a dict (movie['title'], movie.get('release_date')) so code
+    # written against raw TMDB items works with either.
+    __slots__ = MOVIE_FIELDS
+
+    def __init__(self, id, title, overview=None, release_date=None, vote_average=None, poster_path=None):
+        self.id = id
+        self.title = title
+        self.overview = overview
+        self.release_date = release_date
+        self.vote_average = vote_average
+        self.poster_path = poster_path
+
+    @classmethod
+    def from_json(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(
+            data['id'], data.get('title') or '', data.get('overview'), data.get('release_date'),
+            data.get('vote_average'), data.get('poster_path')
+        )
+
+    def __getitem__(self, key):
+        if key not in MOVIE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in MOVIE_FIELDS else None
+        return default if value is None else value
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in MOVIE_FIELDS}
+
+    def __repr__(self):
+        return f"<MovieRecord id={self.id} title={self.title!r}>"
+
+def movie_records(items):
+    return [MovieRecord.from_json(item) for item in items]
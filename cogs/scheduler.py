@@ -0,0 +1,132 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import contextlib
+import contextvars
+
+# TMDB allows roughly 50 requests per second per IP; stay under it
+TMDB_RATE_LIMIT = float(os.getenv('TMDB_RATE_LIMIT', '40'))
+TMDB_RATE_BURST = int(os.getenv('TMDB_RATE_BURST', '20'))
+
+# Priority lanes, lower goes first
+INTERACTIVE = 0
+BACKGROUND = 1
+LANE_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+logger = logging.getLogger(__name__)
+
+# Lane for TMDB calls made from the current task; background jobs switch
+# it with `lane(BACKGROUND)` and everything they await inherits it
+current_lane = contextvars.ContextVar('tmdb_lane', default=INTERACTIVE)
+
+@contextlib.contextmanager
+def lane(priority):
+    token = current_lane.set(priority)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _fill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        # Seconds until one token is available
+        self._fill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._fill()
+        self.tokens -= 1
+
+class LaneStats:
+    def __init__(self):
+        self.queued = 0
+        self.granted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self):
+        return {
+            'queued': self.queued,
+            'granted': self.granted,
+            'wait_avg': self.wait_total / self.granted if self.granted else 0.0,
+            'wait_max': self.wait_max
+        }
+
+class RequestScheduler:
+    def __init__(self, rate=TMDB_RATE_LIMIT, burst=TMDB_RATE_BURST):
+        self.bucket = TokenBucket(rate, burst)
+        self.paused_until = 0.0
+        self.lanes = {priority: LaneStats() for priority in LANE_NAMES}
+        self.throttled = 0
+        self.retries = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._pump_task = None
+
+    async def acquire(self, priority=None):
+        if priority is None:
+            priority = current_lane.get()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), time.monotonic(), future))
+        self.lanes[priority].queued += 1
+        if self._pump_task is None:
+            self._pump_task = asyncio.ensure_future(self._pump())
+        try:
+            await future
+        finally:
+            if not future.done() or future.cancelled():
+                self.lanes[priority].queued -= 1
+
+    def pause(self, seconds):
+        # Hold every lane, e.g. after TMDB answers 429 with Retry-After
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def _pump(self):
+        try:
+            while self._waiters:
+                now = time.monotonic()
+                if self.paused_until > now:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                delay = self.bucket.delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                priority, _, enqueued_at, future = heapq.heappop(self._waiters)
+                if future.done():
+                    continue
+                self.bucket.take()
+                waited = time.monotonic() - enqueued_at
+                stats = self.lanes[priority]
+                stats.queued -= 1
+                stats.granted += 1
+                stats.wait_total += waited
+                stats.wait_max = max(stats.wait_max, waited)
+                future.set_result(None)
+        finally:
+            self._pump_task = None
+
+    def stats(self):
+        return {
+            'lanes': {LANE_NAMES[priority]: stats.as_dict() for priority, stats in self.lanes.items()},
+            'throttled': self.throttled,
+            'retries': self.retries,
+            'paused_for': max(0.0, self.paused_until - time.monotonic())
+        }
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from .guilds import DEFAULT_LIST_ID
+
+SESSION_FILE = 'tmdb_session.json'
+# Servers that may use the operator's default session (the top-level
+# session_id) on the default list without authorizing their own
+HOME_GUILD_IDS = {int(guild_id) for guild_id in os.getenv('HOME_GUILD_IDS', '').split(',') if guild_id.strip()}
+# How often, at most, to stat the file for external changes
+SESSION_CHECK_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    def __init__(self, path=SESSION_FILE, check_interval=SESSION_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._data = {}
+        self._mtime = None
+        self._checked_at = None
+        # save() runs in a worker thread; two saves at once would each
+        # write their own copy and lose the other's session
+        self._save_lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._data, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+
+        # The file changed on disk (or this is the first read)
+        try:
+            with open(self.path, 'r') as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+            logger.info("Loaded TMDB session from disk.")
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to read session file {self.path}: {e}")
+
+    @property
+    def session_id(self):
+        self._refresh()
+        return self._data.get('session_id')
+
+    def guild_session(self, guild_id):
+        # Only the session the guild authorized itself
+        self._refresh()
+        return self._data.get('guilds', {}).get(str(guild_id)) or None
+
+    def get(self, guild_id=None, list_id=None):
+        # A guild's own session if it has one. The default session only
+        # covers the default list, and only for DMs and the home guilds;
+        # every other guild has to run !authorize
+        if guild_id is not None:
+            session_id = self.guild_session(guild_id)
+            if session_id:
+                return session_id
+            if guild_id not in HOME_GUILD_IDS:
+                return None
+        if list_id is not None and str(list_id) != DEFAULT_LIST_ID:
+            return None
+        return self.session_id
+
+    def save(self, session_id, guild_id=None):
+        # Blocking file I/O: call it with asyncio.to_thread from the loop
+        with self._save_lock:
+            self._save(session_id, guild_id)
+
+    def _save(self, session_id, guild_id):
+        # Merge into what's on disk now, not the last copy we happened to
+        # read, so a change another process made isn't overwritten
+        self._checked_at = None
+        self._refresh()
+        if guild_id is None:
+            data = dict(self._data, session_id=session_id)
+        else:
+            guilds = dict(self._data.get('guilds', {}), **{str(guild_id): session_id})
+            data = dict(self._data, guilds=guilds)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmdb_session.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._data = data
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._checked_at = time.monotonic()
+
+session_store = SessionStore()
+
+def load_session_id(guild_id=None, list_id=None):
+    return session_store.get(guild_id, list_id)
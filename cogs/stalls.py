@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+from collections import Counter
+from .metrics import metrics
+
+DIAGNOSTICS = os.getenv('DIAGNOSTICS', '').lower() in ('1', 'true', 'yes', 'on')
+STALL_THRESHOLD = float(os.getenv('STALL_THRESHOLD', '0.1'))  # seconds
+STALL_SAMPLE_INTERVAL = float(os.getenv('STALL_SAMPLE_INTERVAL', '0.005'))
+STALL_PROFILE = os.getenv('STALL_PROFILE', 'stall_profile.folded')
+
+COGS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('event_loop_stalls_total', 'counter', "Event loop stalls longer than the stall threshold, by command.")
+metrics.describe('event_loop_stall_seconds', 'histogram', "Duration of event loop stalls.")
+
+def frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{code.co_qualname}"
+
+def walk_stack(frame):
+    # Outermost frame first, the way folded stacks are written
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+class StallDetector:
+    # Opt-in diagnostics for a blocked event loop. A heartbeat callback runs
+    # on the loop; a watchdog thread notices when it is late, samples the
+    # loop thread's stack until it resumes, and attributes the stall to the
+    # cog and command on that stack. Samples accumulate into a folded profile
+    # (one "outer;...;inner count" line per stack) that flamegraph.pl and
+    # speedscope read directly. Enabling also turns on asyncio's own
+    # slow-callback warnings with the same threshold.
+    def __init__(self, threshold=STALL_THRESHOLD, sample_interval=STALL_SAMPLE_INTERVAL, profile_path=STALL_PROFILE):
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.profile_path = profile_path
+        self.profile = Counter()
+        self.stalls = 0
+        self.worst = 0.0
+        self.last_stall = None
+        self.enabled = False
+        # code object -> command name, module name -> cog name
+        self.commands = {}
+        self.cogs = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._thread_id = None
+        self._stop = None
+        self._beat_handle = None
+        self._due_at = 0.0
+        self._saved_debug = None
+
+    def index_bot(self, bot):
+        # Map command callbacks and cog modules so sampled frames can be named
+        self.commands = {command.callback.__code__: command.qualified_name for command in bot.walk_commands()}
+        self.cogs = {type(cog).__module__: name for name, cog in bot.cogs.items()}
+
+    def enable(self, threshold=None):
+        # Must be called from the loop's own thread
+        if threshold is not None:
+            self.threshold = threshold
+        loop = asyncio.get_running_loop()
+        if self.enabled:
+            loop.slow_callback_duration = self.threshold
+            return
+        self._loop = loop
+        self._thread_id = threading.get_ident()
+        self._saved_debug = (loop.get_debug(), loop.slow_callback_duration)
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold
+
+        self._stop = threading.Event()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name='stall-watchdog', daemon=True)
+        self._thread.start()
+        self.enabled = True
+        logger.info(f"Stall detection enabled at {self.threshold * 1000:.0f} ms.")
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._stop.set()
+        if self._beat_handle is not None:
+            self._beat_handle.cancel()
+            self._beat_handle = None
+        debug, slow_callback_duration = self._saved_debug
+        self._loop.set_debug(debug)
+        self._loop.slow_callback_duration = slow_callback_duration
+        # The watchdog wakes every sample interval, so this returns promptly
+        self._thread.join(timeout=1)
+        self._thread = None
+        logger.info("Stall detection disabled.")
+
+    def _beat(self):
+        interval = max(self.sample_interval, self.threshold / 2)
+        self._due_at = time.monotonic() + interval
+        self._beat_handle = self._loop.call_later(interval, self._beat)
+
+    def _fold(self, frame):
+        frames = walk_stack(frame)
+        stack = ';'.join(frame_label(item) for item in frames)
+        command = None
+        cog = None
+        location = None
+        for item in frames:
+            if command is None:
+                command = self.commands.get(item.f_code)
+            module = item.f_globals.get('__name__')
+            if module in self.cogs:
+                cog = self.cogs[module]
+            if item.f_code.co_filename.startswith(COGS_DIR):
+                # Innermost frame in our own code
+                location = f"{os.path.relpath(item.f_code.co_filename, os.path.dirname(COGS_DIR))}:{item.f_lineno} in {item.f_code.co_name}"
+        return stack, command, cog, location
+
+    def _watch(self):
+        samples = Counter()
+        culprits = Counter()
+        started = None
+        while not self._stop.wait(self.sample_interval):
+            now = time.monotonic()
+            if now - self._due_at > self.threshold:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is None:
+                    continue
+                if started is None:
+                    started = self._due_at
+                stack, command, cog, location = self._fold(frame)
+                del frame
+                samples[stack] += 1
+                culprits[(command, cog, location)] += 1
+            elif started is not None:
+                self._finish(now - started, samples, culprits)
+                samples = Counter()
+                culprits = Counter()
+                started = None
+
+    def _finish(self, duration, samples, culprits):
+        # Runs on the watchdog thread: write the profile here so the loop
+        # never waits on the disk
+        with self._lock:
+            self.profile.update(samples)
+            self._write_profile()
+        (command, cog, location), _ = culprits.most_common(1)[0]
+        stall = {
+            'duration': duration,
+            'command': command,
+            'cog': cog,
+            'location': location,
+            'samples': sum(samples.values()),
+            'stack': samples.most_common(1)[0][0]
+        }
+        try:
+            self._loop.call_soon_threadsafe(self._report, stall)
+        except RuntimeError:
+            # The loop closed while it was stalled
+            pass
+
+    def _report(self, stall):
+        self.stalls += 1
+        self.worst = max(self.worst, stall['duration'])
+        self.last_stall = stall
+        metrics.inc('event_loop_stalls_total', command=stall['command'] or 'none')
+        metrics.observe('event_loop_stall_seconds', stall['duration'])
+        logger.warning(
+            f"Event loop stalled for {stall['duration'] * 1000:.0f} ms in "
+            f"cog {stall['cog'] or '?'}, command {stall['command'] or '?'} at {stall['location'] or 'unknown'}; "
+            f"{stall['samples']} samples written to {self.profile_path}. Hottest stack: {stall['stack']}"
+        )
+
+    def _write_profile(self):
+        directory = os.path.dirname(os.path.abspath(self.profile_path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+            for stack, count in self.profile.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(f.name, self.profile_path)
+
+    def folded(self):
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.profile.most_common())
+
+    def reset(self):
+        with self._lock:
+            self.profile.clear()
+        self.stalls = 0
+        self.worst = 0.0
+        self.last_stall = None
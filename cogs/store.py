@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from .titles import normalize_title
+from .records import MovieRecord
+
+WATCHLIST_DB = os.getenv('WATCHLIST_DB', 'projectionist.db')
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS watchlist_items (
+    list_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    normalized_title TEXT NOT NULL,
+    release_date TEXT,
+    vote_average REAL,
+    poster_path TEXT,
+    overview TEXT,
+    PRIMARY KEY (list_id, id)
+);
+CREATE INDEX IF NOT EXISTS watchlist_items_title ON watchlist_items (list_id, normalized_title);
+CREATE TABLE IF NOT EXISTS guild_config (
+    guild_id TEXT PRIMARY KEY,
+    list_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT,
+    list_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    media_id INTEGER NOT NULL,
+    payload TEXT,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    channel_id INTEGER,
+    failed_at REAL
+);
+CREATE TABLE IF NOT EXISTS movie_details (
+    id INTEGER PRIMARY KEY,
+    runtime INTEGER,
+    genres TEXT NOT NULL,
+    enriched_at REAL NOT NULL
+);
+'''
+
+ITEM_FIELDS = ('id', 'title', 'release_date', 'vote_average', 'poster_path', 'overview')
+
+def _row(list_id, position, movie):
+    return (
+        str(list_id), int(movie['id']), position, movie.get('title') or '',
+        normalize_title(movie.get('title')), movie.get('release_date'),
+        movie.get('vote_average'), movie.get('poster_path'), movie.get('overview')
+    )
+
+class WatchlistStore:
+    def __init__(self, path=WATCHLIST_DB):
+        self.path = path
+        self.conn = None
+        # One worker thread keeps writes ordered and off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='watchlist-store')
+
+    def _open(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.executescript(SCHEMA)
+            self._migrate(self.conn)
+        return self.conn
+
+    def _migrate(self, conn):
+        # Columns added after the first release of a table
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+        with conn:
+            for column, kind in (('channel_id', 'INTEGER'), ('failed_at', 'REAL')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def _load(self, list_id):
+        rows = self._open().execute(
+            f"SELECT {', '.join(ITEM_FIELDS)} FROM watchlist_items WHERE list_id = ? ORDER BY position",
+            (str(list_id),)
+        ).fetchall()
+        return [MovieRecord(**dict(zip(ITEM_FIELDS, row))) for row in rows]
+
+    def _replace(self, list_id, items):
+        conn = self._open()
+        with conn:
+            conn.execute("DELETE FROM watchlist_items WHERE list_id = ?", (str(list_id),))
+            conn.executemany(
+                "INSERT OR REPLACE INTO watchlist_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [_row(list_id, position, movie) for position, movie in enumerate(items)]
+            )
+
+    def _upsert(self, list_id, movie):
+        conn = self._open()
+        with conn:
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM watchlist_items WHERE list_id = ?", (str(list_id),)
+            ).fetchone()[0]
+            existing = conn.execute(
+                "SELECT position FROM watchlist_items WHERE list_id = ? AND id = ?", (str(list_id), int(movie['id']))
+            ).fetchone()
+            if existing:
+                position = existing[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO watchlist_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _row(list_id, position, movie)
+            )
+
+    def _delete(self, list_id, movie_id):
+        conn = self._open()
+        with conn:
+            conn.execute("DELETE FROM watchlist_items WHERE list_id = ? AND id = ?", (str(list_id), int(movie_id)))
+
+    def _load_guild_lists(self):
+        return dict(self._open().execute("SELECT guild_id, list_id FROM guild_config").fetchall())
+
+    def _save_guild_list(self, guild_id, list_id):
+        conn = self._open()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO guild_config VALUES (?, ?)", (str(guild_id), str(list_id)))
+
+    def _outbox_append(self, guild_id, list_id, op, changes, channel_id):
+        # changes is [(media_id, payload)]; all rows commit together
+        conn = self._open()
+        seqs = []
+        with conn:
+            for media_id, payload in changes:
+                cursor = conn.execute(
+                    "INSERT INTO outbox (guild_id, list_id, op, media_id, payload, created_at, channel_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (None if guild_id is None else str(guild_id), str(list_id), op, int(media_id),
+                     json.dumps(payload) if payload is not None else None, time.time(), channel_id)
+                )
+                seqs.append(cursor.lastrowid)
+        return seqs
+
+    def _outbox_load(self, failed):
+        # Pending entries, or the dead letters TMDB rejected for good
+        rows = self._open().execute(
+            "SELECT seq, guild_id, list_id, op, media_id, payload, attempts, next_attempt_at, channel_id, failed_at, last_error "
+            f"FROM outbox WHERE failed_at IS {'NOT NULL' if failed else 'NULL'} ORDER BY seq"
+        ).fetchall()
+        return [
+            {
+                'seq': seq, 'guild_id': int(guild_id) if guild_id else None, 'list_id': list_id, 'op': op,
+                'media_id': media_id, 'payload': json.loads(payload) if payload else None,
+                'attempts': attempts, 'next_attempt_at': next_attempt_at, 'channel_id': channel_id,
+                'failed_at': failed_at, 'error': last_error
+            }
+            for seq, guild_id, list_id, op, media_id, payload, attempts, next_attempt_at, channel_id, failed_at, last_error in rows
+        ]
+
+    def _outbox_delete(self, seqs):
+        conn = self._open()
+        with conn:
+            conn.executemany("DELETE FROM outbox WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def _outbox_defer(self, seqs, attempts, next_attempt_at, error):
+        conn = self._open()
+        with conn:
+            conn.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE seq = ?",
+                [(attempts, next_attempt_at, error, seq) for seq in seqs]
+            )
+
+    def _outbox_fail(self, seq, failed_at, error):
+        conn = self._open()
+        with conn:
+            conn.execute("UPDATE outbox SET failed_at = ?, last_error = ? WHERE seq = ?", (failed_at, error, seq))
+
+    def _load_details(self):
+        rows = self._open().execute("SELECT id, runtime, genres FROM movie_details").fetchall()
+        return {
+            str(movie_id): {'runtime': runtime, 'genres': genres.split('|') if genres else []}
+            for movie_id, runtime, genres in rows
+        }
+
+    def _save_details(self, details):
+        conn = self._open()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO movie_details VALUES (?, ?, ?, ?)",
+                [
+                    (int(movie_id), record['runtime'], '|'.join(record['genres']), time.time())
+                    for movie_id, record in details.items()
+                ]
+            )
+
+    async def load(self, list_id):
+        return await self._run(self._load, list_id)
+
+    async def replace(self, list_id, items):
+        await self._run(self._replace, list_id, items)
+
+    async def load_guild_lists(self):
+        return await self._run(self._load_guild_lists)
+
+    async def save_guild_list(self, guild_id, list_id):
+        await self._run(self._save_guild_list, guild_id, list_id)
+
+    async def outbox_append(self, guild_id, list_id, op, media_id, payload=None, channel_id=None):
+        seqs = await self._run(self._outbox_append, guild_id, list_id, op, [(media_id, payload)], channel_id)
+        return seqs[0]
+
+    async def outbox_append_many(self, guild_id, list_id, op, changes, channel_id=None):
+        return await self._run(self._outbox_append, guild_id, list_id, op, changes, channel_id)
+
+    async def outbox_load(self, failed=False):
+        return await self._run(self._outbox_load, failed)
+
+    async def outbox_fail(self, seq, failed_at, error):
+        await self._run(self._outbox_fail, seq, failed_at, error)
+
+    async def outbox_delete(self, seqs):
+        await self._run(self._outbox_delete, seqs)
+
+    async def outbox_defer(self, seqs, attempts, next_attempt_at, error):
+        await self._run(self._outbox_defer, seqs, attempts, next_attempt_at, error)
+
+    async def load_details(self):
+        return await self._run(self._load_details)
+
+    async def save_details(self, details):
+        await self._run(self._save_details, details)
+
+    async def upsert(self, list_id, movie):
+        await self._run(self._upsert, list_id, movie)
+
+    async def delete(self, list_id, movie_id):
+        await self._run(self._delete, list_id, movie_id)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
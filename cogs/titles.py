@@ -0,0 +1,129 @@
+import re
+import bisect
+import unicodedata
+from collections import defaultdict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_title(title):
+    # Lowercase, strip accents and punctuation, collapse whitespace
+    title = unicodedata.normalize('NFKD', title or '')
+    title = ''.join(ch for ch in title if not unicodedata.combining(ch))
+    title = _PUNCTUATION.sub(' ', title.casefold())
+    return _WHITESPACE.sub(' ', title).strip()
+
+_TRAILING_YEAR = re.compile(r"^(.*?)\s*\(?\b((?:18|19|20)\d{2})\)?$")
+
+def split_year(title):
+    # "The Thing (1982)" -> ("The Thing", "1982")
+    match = _TRAILING_YEAR.match((title or '').strip())
+    if match and match.group(1):
+        return match.group(1), match.group(2)
+    return title, None
+
+def release_year(movie):
+    return (movie.get('release_date') or '')[:4] or None
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TitleIndex:
+    def __init__(self, items=()):
+        self.movies = {}
+        # normalized title -> movie ids
+        self.exact = defaultdict(set)
+        # trigram -> movie ids
+        self.grams = defaultdict(set)
+        self._keys = {}
+        # Sorted normalized titles for prefix completion, rebuilt lazily
+        self._sorted = None
+        self.rebuild(items)
+
+    def rebuild(self, items):
+        self.movies.clear()
+        self.exact.clear()
+        self.grams.clear()
+        self._keys.clear()
+        self._sorted = None
+        for movie in items:
+            self.add(movie)
+
+    def add(self, movie):
+        movie_id = str(movie['id'])
+        if movie_id in self.movies:
+            self.remove(movie_id)
+        key = normalize_title(movie.get('title'))
+        grams = trigrams(key)
+        self.movies[movie_id] = movie
+        self._keys[movie_id] = (key, grams)
+        if key not in self.exact:
+            self._sorted = None
+        self.exact[key].add(movie_id)
+        for gram in grams:
+            self.grams[gram].add(movie_id)
+
+    def remove(self, movie_id):
+        movie_id = str(movie_id)
+        if self.movies.pop(movie_id, None) is None:
+            return
+        key, grams = self._keys.pop(movie_id)
+        self.exact[key].discard(movie_id)
+        if not self.exact[key]:
+            del self.exact[key]
+            self._sorted = None
+        for gram in grams:
+            self.grams[gram].discard(movie_id)
+            if not self.grams[gram]:
+                del self.grams[gram]
+
+    def lookup(self, query):
+        # Exact matches on the normalized title, optionally narrowed by a
+        # trailing year in the query
+        ids = self.exact.get(normalize_title(query))
+        if not ids:
+            title, year = split_year(query)
+            ids = self.exact.get(normalize_title(title), set())
+            if year:
+                ids = {movie_id for movie_id in ids if release_year(self.movies[movie_id]) == year}
+        return [self.movies[movie_id] for movie_id in sorted(ids)]
+
+    def search(self, query, limit=5, min_score=0.3):
+        # Rank by trigram Dice similarity
+        title, _ = split_year(query)
+        grams = trigrams(normalize_title(title))
+        if not grams:
+            return []
+        shared = defaultdict(int)
+        for gram in grams:
+            for movie_id in self.grams.get(gram, ()):
+                shared[movie_id] += 1
+        scored = []
+        for movie_id, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._keys[movie_id][1]))
+            if score >= min_score:
+                scored.append((score, movie_id))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [self.movies[movie_id] for _, movie_id in scored[:limit]]
+
+    def complete(self, query, limit=25):
+        # Autocomplete: titles starting with the query first, then the best
+        # trigram matches to cover typos and words in the middle of a title
+        if self._sorted is None:
+            self._sorted = sorted(self.exact)
+        prefix = normalize_title(query)
+        found = {}
+        start = bisect.bisect_left(self._sorted, prefix)
+        for key in self._sorted[start:]:
+            if not key.startswith(prefix) or len(found) >= limit:
+                break
+            for movie_id in sorted(self.exact[key]):
+                found.setdefault(movie_id, self.movies[movie_id])
+        if prefix and len(found) < limit:
+            for movie in self.search(query, limit=limit, min_score=0.2):
+                found.setdefault(str(movie['id']), movie)
+        return list(found.values())[:limit]
+
+    def __len__(self):
+        return len(self.movies)
@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+from .cache import TTLCache, SingleFlight
+from .titles import normalize_title
+from .scheduler import RequestScheduler
+from .metrics import metrics, endpoint_label
+from .records import MovieRecord, movie_records
+
+TMDB_URL = os.getenv('TMDB_URL', "https://api.themoviedb.org/3")
+TMDB_TIMEOUT = float(os.getenv('TMDB_TIMEOUT', '10'))
+TMDB_POOL_SIZE = int(os.getenv('TMDB_POOL_SIZE', '20'))
+TMDB_KEEPALIVE = float(os.getenv('TMDB_KEEPALIVE', '60'))
+TMDB_PAGE_CONCURRENCY = int(os.getenv('TMDB_PAGE_CONCURRENCY', '4'))
+TMDB_PAGE_RETRIES = int(os.getenv('TMDB_PAGE_RETRIES', '2'))
+TMDB_MAX_RETRIES = int(os.getenv('TMDB_MAX_RETRIES', '3'))
+TMDB_CACHE_SIZE = int(os.getenv('TMDB_CACHE_SIZE', '512'))
+TMDB_CACHE_TTL = float(os.getenv('TMDB_CACHE_TTL', '3600'))
+
+logger = logging.getLogger(__name__)
+
+class TMDBResponse:
+    def __init__(self, status, data=None, text='', retry_after=None):
+        self.status = status
+        self.data = data
+        self.text = text
+        self.retry_after = retry_after
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    @property
+    def retryable(self):
+        return self.status == 429 or self.status >= 500
+
+    def describe(self):
+        # Short reason suitable for a channel message
+        if self.status == 429:
+            return "TMDB is rate limiting requests, please try again in a moment."
+        if self.status >= 500 or self.status == 0:
+            return "TMDB is not responding right now, please try again later."
+        return f"{self.status} - {self.text}"
+
+    def __repr__(self):
+        return f"<TMDBResponse status={self.status}>"
+
+class ListFetch:
+    def __init__(self, items, total_pages, total_results, missing_pages, page_timings):
+        self.items = items
+        self.total_pages = total_pages
+        self.total_results = total_results
+        # Pages that still failed after retries; their items are absent
+        self.missing_pages = missing_pages
+        # page -> seconds spent on that page, retries included
+        self.page_timings = page_timings
+
+    @property
+    def complete(self):
+        return not self.missing_pages
+
+    @property
+    def ok(self):
+        return self.total_pages is not None
+
+class ListPage:
+    def __init__(self, page, items, total_pages, total_results, elapsed):
+        self.page = page
+        # None when the page still failed after retries
+        self.items = items
+        self.total_pages = total_pages
+        self.total_results = total_results
+        self.elapsed = elapsed
+
+def _retry_after(headers):
+    value = headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+def _clean_params(params):
+    # aiohttp only accepts str/int/float query values
+    cleaned = {}
+    for key, value in (params or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        cleaned[key] = value
+    return cleaned
+
+class TMDBClient:
+    def __init__(self, token=None, base_url=TMDB_URL, timeout=TMDB_TIMEOUT, pool_size=TMDB_POOL_SIZE):
+        self.token = token if token is not None else os.getenv('TMDB_TOKEN')
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = None
+        # Set by close(); requests after that fail instead of reopening the pool
+        self.closed = False
+        # Search and movie detail lookups are cached and coalesced
+        self.search_cache = TTLCache(TMDB_CACHE_SIZE, TMDB_CACHE_TTL)
+        self.details_cache = TTLCache(TMDB_CACHE_SIZE, TMDB_CACHE_TTL)
+        self.inflight = SingleFlight()
+        # Token bucket and priority lanes in front of every request
+        self.scheduler = RequestScheduler()
+
+    async def start(self):
+        self.closed = False
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=TMDB_KEEPALIVE, ttl_dns_cache=300)
+        headers = {
+            'accept': 'application/json',
+            'Authorization': f'Bearer {self.token}'
+        }
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        logger.info("TMDB client session opened.")
+
+    async def close(self):
+        self.closed = True
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            logger.info("TMDB client session closed.")
+        self.session = None
+
+    async def request(self, method, path, *, params=None, json_body=None, timeout=None, priority=None):
+        # Only GETs are retried here. A POST may have been applied even when
+        # TMDB answered with an error, and the outbox retries list changes
+        # itself.
+        retries = TMDB_MAX_RETRIES if method == 'GET' else 0
+        for attempt in range(retries + 1):
+            await self.scheduler.acquire(priority)
+            response = await self._send(method, path, params, json_body, timeout)
+            if not response.retryable:
+                return response
+
+            # Exponential backoff with jitter, or whatever TMDB asked for
+            delay = 0.5 * (2 ** attempt) + random.uniform(0, 0.5)
+            if response.status == 429:
+                self.scheduler.throttled += 1
+                if response.retry_after is not None:
+                    delay = response.retry_after
+                self.scheduler.pause(delay)
+            if attempt == retries:
+                return response
+            self.scheduler.retries += 1
+            logger.warning(f"TMDB returned {response.status} for {method} {path}, retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+        return response
+
+    async def _send(self, method, path, params, json_body, timeout):
+        started = time.perf_counter()
+        response = await self._send_once(method, path, params, json_body, timeout)
+        endpoint = f"{method} {endpoint_label(path)}"
+        metrics.inc('tmdb_requests_total', endpoint=endpoint, status=response.status)
+        metrics.observe('tmdb_request_seconds', time.perf_counter() - started, endpoint=endpoint)
+        return response
+
+    async def _send_once(self, method, path, params, json_body, timeout):
+        if self.closed:
+            logger.error(f"TMDB request after the client was closed: {method} {path}")
+            return TMDBResponse(0, None, 'TMDB client is closed')
+        if self.session is None or self.session.closed:
+            await self.start()
+
+        url = f"{self.base_url}{path}"
+        kwargs = {'params': _clean_params(params), 'json': json_body}
+        # Passing timeout=None would switch the deadline off entirely, so only
+        # override the session's ClientTimeout when a call asks for its own
+        if timeout:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                text = await response.text()
+                try:
+                    data = json.loads(text) if text else None
+                except json.JSONDecodeError:
+                    data = None
+                return TMDBResponse(response.status, data, text, _retry_after(response.headers))
+        except asyncio.TimeoutError:
+            logger.error(f"TMDB request timed out: {method} {path}")
+            return TMDBResponse(0, None, 'Request timed out')
+        except aiohttp.ClientError as e:
+            logger.error(f"TMDB request failed: {method} {path} - {e}")
+            return TMDBResponse(0, None, str(e))
+
+    async def _cached(self, cache, key, path, params):
+        response = cache.get(key)
+        if response is not None:
+            return response
+
+        async def fetch():
+            response = await self.get(path, params=params)
+            # Only successful lookups are worth remembering
+            if response.status == 200:
+                cache.set(key, response)
+            return response
+
+        return await self.inflight.do((path, key), fetch)
+
+    def collect_metrics(self):
+        samples = []
+        for name, cache in (('search', self.search_cache), ('details', self.details_cache)):
+            samples.append(('tmdb_cache_hits', {'cache': name}, cache.hits))
+            samples.append(('tmdb_cache_misses', {'cache': name}, cache.misses))
+            samples.append(('tmdb_cache_hit_ratio', {'cache': name}, cache.hit_ratio))
+            samples.append(('tmdb_cache_entries', {'cache': name}, len(cache)))
+        samples.append(('tmdb_coalesced_requests', {}, self.inflight.shared))
+        for lane_name, stats in self.scheduler.stats()['lanes'].items():
+            samples.append(('tmdb_queue_depth', {'lane': lane_name}, stats['queued']))
+            samples.append(('tmdb_queue_wait_avg_seconds', {'lane': lane_name}, stats['wait_avg']))
+            samples.append(('tmdb_queue_wait_max_seconds', {'lane': lane_name}, stats['wait_max']))
+        samples.append(('tmdb_throttled', {}, self.scheduler.throttled))
+        samples.append(('tmdb_retries', {}, self.scheduler.retries))
+        return samples
+
+    def cache_stats(self):
+        return {
+            'search': self.search_cache.stats(),
+            'details': self.details_cache.stats(),
+            'coalesced': self.inflight.shared
+        }
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    # Lists
+    async def get_list_page(self, list_id, session_id, page=1):
+        params = {"session_id": session_id, "language": "en-US", "page": page}
+        return await self.get(f"/list/{list_id}", params=params)
+
+    async def _fetch_page_with_retry(self, list_id, session_id, page, retries):
+        # request() already retried 429s and 5xx; only timeouts and dropped
+        # connections (status 0) are worth another try here
+        started = time.perf_counter()
+        for attempt in range(retries + 1):
+            response = await self.get_list_page(list_id, session_id, page=page)
+            if response.status == 200:
+                return response, time.perf_counter() - started
+            logger.warning(f"Failed to fetch TMDB list page {page} (attempt {attempt + 1}): {response.status} - {response.text}")
+            if response.status != 0:
+                break
+            if attempt < retries:
+                await asyncio.sleep(0.25 * (2 ** attempt) + random.uniform(0, 0.1))
+        return response, time.perf_counter() - started
+
+    async def iter_list(self, list_id, session_id, concurrency=TMDB_PAGE_CONCURRENCY, retries=TMDB_PAGE_RETRIES):
+        # Yields a ListPage per page as it arrives: page 1 first (it tells
+        # us how many pages there are), then the rest in completion order
+        # with at most `concurrency` in flight. Items are compact
+        # MovieRecords; the raw page JSON is dropped as soon as it is parsed.
+        # Consumers that stop early should close the iterator (contextlib's
+        # aclosing) so pages still in flight are cancelled, not left running.
+        first, elapsed = await self._fetch_page_with_retry(list_id, session_id, 1, retries)
+        # A 200 with an empty or non-JSON body counts as a failed page
+        if first.status != 200 or first.data is None:
+            yield ListPage(1, None, None, None, elapsed)
+            return
+
+        total_pages = first.data.get('total_pages') or 1
+        total_results = first.data.get('total_results', first.data.get('item_count'))
+        yield ListPage(1, movie_records(first.data.get('items', [])), total_pages, total_results, elapsed)
+        del first
+
+        async def fetch(page):
+            response, page_elapsed = await self._fetch_page_with_retry(list_id, session_id, page, retries)
+            items = movie_records(response.data.get('items', [])) if response.status == 200 and response.data is not None else None
+            return ListPage(page, items, total_pages, total_results, page_elapsed)
+
+        remaining = iter(range(2, total_pages + 1))
+        running = set()
+        try:
+            while True:
+                # Keep the window full; pages after an early stop are never requested
+                while len(running) < max(1, concurrency):
+                    page = next(remaining, None)
+                    if page is None:
+                        break
+                    running.add(asyncio.ensure_future(fetch(page)))
+                if not running:
+                    break
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def fetch_list(self, list_id, session_id, concurrency=TMDB_PAGE_CONCURRENCY, retries=TMDB_PAGE_RETRIES):
+        pages = {}
+        page_timings = {}
+        missing_pages = []
+        total_pages = total_results = None
+        async for page in self.iter_list(list_id, session_id, concurrency, retries):
+            page_timings[page.page] = page.elapsed
+            total_pages, total_results = page.total_pages, page.total_results
+            if page.items is None:
+                missing_pages.append(page.page)
+            else:
+                pages[page.page] = page.items
+        if total_pages is None:
+            return ListFetch([], None, None, [1], page_timings)
+
+        # Reassemble in page order so the list order matches TMDB
+        items = []
+        for page in sorted(pages):
+            items.extend(pages[page])
+        return ListFetch(items, total_pages, total_results, sorted(missing_pages), page_timings)
+
+    async def fetch_random_list_item(self, list_id, session_id):
+        # Uniform pick over the whole list using at most two page requests:
+        # page 1 gives total_results and the page size, then only the page
+        # holding the chosen index is fetched
+        first = await self.get_list_page(list_id, session_id, page=1)
+        if first.status != 200 or first.data is None:
+            logger.error(f"Failed to fetch TMDB list: {first.status} - {first.text}")
+            return None
+
+        first_items = first.data.get('items', [])
+        total = first.data.get('total_results', first.data.get('item_count')) or 0
+        if not total or not first_items:
+            return None
+
+        page_size = len(first_items)
+        index = random.randrange(total)
+        page, offset = divmod(index, page_size)
+        if page == 0:
+            return MovieRecord.from_json(first_items[offset])
+
+        response = await self.get_list_page(list_id, session_id, page=page + 1)
+        if response.status != 200 or response.data is None:
+            logger.error(f"Failed to fetch TMDB list page {page + 1}: {response.status} - {response.text}")
+            return None
+        page_items = response.data.get('items', [])
+        if offset < len(page_items):
+            return MovieRecord.from_json(page_items[offset])
+
+        # The list shrank between the two requests
+        logger.warning(f"TMDB list changed while spinning, picking from page {page + 1} instead.")
+        return MovieRecord.from_json(random.choice(page_items or first_items))
+
+    async def add_item(self, list_id, session_id, media_id):
+        payload = {"media_type": "movie", "media_id": media_id}
+        return await self.post(f"/list/{list_id}/add_item", params={"session_id": session_id}, json_body=payload)
+
+    async def remove_item(self, list_id, session_id, media_id):
+        payload = {"media_id": media_id}
+        return await self.post(f"/list/{list_id}/remove_item", params={"session_id": session_id}, json_body=payload)
+
+    # Movies
+    async def search_movie(self, query, page=1):
+        params = {'query': query, 'include_adult': False, 'language': 'en-US', 'page': page}
+        key = (normalize_title(query), page)
+        return await self._cached(self.search_cache, key, "/search/movie", params)
+
+    def cached_search(self, query, page=1):
+        # The cached response for a search, without making a request
+        return self.search_cache.peek((normalize_title(query), page))
+
+    async def get_movie_details(self, movie_id, cached=True):
+        params = {'language': 'en-US'}
+        if not cached:
+            # Bulk callers skip the LRU so they don't evict interactive entries
+            return await self.get(f"/movie/{movie_id}", params=params)
+        return await self._cached(self.details_cache, str(movie_id), f"/movie/{movie_id}", params)
+
+    # Authentication
+    async def create_request_token(self):
+        return await self.get("/authentication/token/new")
+
+    async def create_session_id(self, request_token):
+        return await self.post("/authentication/session/new", json_body={'request_token': request_token})
@@ -0,0 +1,143 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from .titles import TitleIndex
+from .scheduler import lane, BACKGROUND
+
+WATCHLIST_TTL = float(os.getenv('WATCHLIST_TTL', '300'))
+
+logger = logging.getLogger(__name__)
+
+def page_signature(items):
+    return hashlib.sha1(','.join(str(movie['id']) for movie in items).encode()).hexdigest()
+
+def same_movie(a, b):
+    # TMDB ids arrive as ints from the API and as strings from URLs
+    return str(a) == str(b)
+
+class WatchlistCache:
+    def __init__(self, loader, ttl=WATCHLIST_TTL, store=None, list_id=None):
+        # loader is a coroutine function returning a ListFetch, or None on failure
+        self.loader = loader
+        self.ttl = ttl
+        # Optional WatchlistStore that mirrors every change to disk
+        self.store = store
+        self.list_id = list_id
+        self._pending_writes = set()
+        self.items = None
+        self.loaded_at = None
+        # Pages the last fetch could not get; a refresh is due while set
+        self.missing_pages = []
+        self.index = TitleIndex()
+        # When a background refresher keeps the list warm, serve stale copies
+        # immediately and revalidate behind the caller
+        self.stale_while_revalidate = False
+        self._refresh_task = None
+
+    async def warm_start(self):
+        # Serve the last snapshot from disk until the first refresh lands
+        if self.store is None or self.items is not None:
+            return
+        items = await self.store.load(self.list_id)
+        if items:
+            self._set_items(items)
+            logger.info(f"Loaded {len(items)} watchlist items from the local store.")
+
+    def _persist(self, method, *args):
+        if self.store is None:
+            return
+        task = asyncio.ensure_future(getattr(self.store, method)(self.list_id, *args))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task):
+        self._pending_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to write watchlist store: {task.exception()}")
+
+    def is_fresh(self):
+        if self.items is None or self.loaded_at is None:
+            return False
+        return time.monotonic() - self.loaded_at < self.ttl
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    async def get(self, force=False):
+        if not force and self.is_fresh():
+            return self.items
+        if not force and self.stale_while_revalidate and self.items is not None:
+            if self._refresh_task is None:
+                # Nobody waits on this refresh, so it queues behind
+                # interactive TMDB calls rather than in the caller's lane
+                with lane(BACKGROUND):
+                    self._refresh_task = asyncio.ensure_future(self._load())
+            return self.items
+        return await self.refresh()
+
+    async def refresh(self):
+        # Concurrent callers share one in-flight refresh
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._load())
+        return await asyncio.shield(self._refresh_task)
+
+    async def _load(self):
+        try:
+            result = await self.loader()
+            if result is None:
+                if self.items is not None:
+                    logger.warning("Watchlist refresh failed, serving the previous copy.")
+                return self.items
+            self.missing_pages = result.missing_pages
+            if result.complete:
+                self._set_items(result.items)
+                self.loaded_at = time.monotonic()
+                self._persist('replace', self.items)
+            elif self.items is None:
+                # Nothing to fall back on: serve the pages that arrived, but
+                # leave the snapshot alone and fetch again on the next read
+                self._set_items(result.items)
+            else:
+                logger.warning(f"Watchlist refresh missed pages {result.missing_pages}, serving the previous copy.")
+            return self.items
+        finally:
+            self._refresh_task = None
+
+    def _set_items(self, items):
+        self.items = list(items)
+        self.index.rebuild(self.items)
+
+    def matches(self, first_page):
+        # Cheap drift check against page 1 of the list: item count plus a
+        # hash of the ids on that page
+        if self.items is None:
+            return False
+        total = first_page.get('total_results', first_page.get('item_count'))
+        if total != len(self.items):
+            return False
+        page_items = first_page.get('items', [])
+        return page_signature(page_items) == page_signature(self.items[:len(page_items)])
+
+    def touch(self):
+        self.loaded_at = time.monotonic()
+
+    def find(self, movie_id):
+        return self.index.movies.get(str(movie_id))
+
+    def add(self, movie):
+        # Patch the cached copy in place after a successful add_item
+        if self.items is None or self.find(movie['id']) is not None:
+            return
+        self.items.append(movie)
+        self.index.add(movie)
+        self._persist('upsert', movie)
+
+    def remove(self, movie_id):
+        # Patch the cached copy in place after a successful remove_item
+        if self.items is None:
+            return
+        self.items = [movie for movie in self.items if not same_movie(movie['id'], movie_id)]
+        self.index.remove(movie_id)
+        self._persist('delete', movie_id)